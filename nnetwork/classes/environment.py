@@ -0,0 +1,18 @@
+import numpy as np
+
+
+class VectorEnvironment:
+    def __init__(self, batch_size: int):
+        # The amount of instances that step together.
+        self.batch_size = batch_size
+
+    # Start new episodes in every instance and return the first observations,
+    # with shape (batch_size, observation_size).
+    def reset(self) -> np.ndarray:
+        raise NotImplementedError()
+
+    # Apply one action per instance. Returns the observations, the reward of this step
+    # per instance and whether the episode of each instance is over.
+    # Instances whose episode is over may be given any action, and should not give rewards.
+    def step(self, actions: np.ndarray) -> tuple:
+        raise NotImplementedError()
@@ -1,36 +1,40 @@
+import collections
 import logging
-import math
-import pickle
+import numpy as np
 
+from nnetwork.classes.genome import GenomeStore
 from nnetwork.classes.neuralnet import Network
 from nnetwork.util.genn import breeding
+from nnetwork.util import checkpoint
+from nnetwork.util import episodes
+from nnetwork.util import lineage
+from nnetwork.util import parallel
+from nnetwork.util import pipeline
 from nnetwork.util import rng
+from nnetwork.util import selection
 
 
-class GeNNetic:
-    def __init__(self, hidden_layer_count: int, network_structure: list, population_size: int = 5000, mutation_chance: float = 0.02, mutation_severity: int = None, activation_function="tanh", breeding_function="crossover", console_log_level=logging.INFO, file_log_level=None):
-        # Make a logger if requested.
-        if console_log_level is not None or file_log_level is not None:
-            self.logger = logging.getLogger("GeNN")
-            self.logger.setLevel(logging.DEBUG)
-
-            if console_log_level is not None:
-                console_handler = logging.StreamHandler()
-                console_handler.setLevel(console_log_level)
+# With lazy breeding, the children are made in chunks of this many, so the random numbers they use do not depend on
+# which specimens are asked for first, or on a checkpoint being saved in between.
+LAZY_CHUNK_SIZE = 64
 
-            if file_log_level is not None:
-                file_handler = logging.FileHandler("GeNN.log", mode='w')
-                file_handler.setLevel(file_log_level)
 
-            log_format = logging.Formatter("[%(name)s] %(asctime)s: %(levelname)s - %(message)s")
-
-            if console_log_level is not None:
-                console_handler.setFormatter(log_format)
-                self.logger.addHandler(console_handler)
+class GeNNetic:
+    # The settings and counters that are stored in the header of a checkpoint.
+    # Subclasses can add their own, as long as they can be stored as JSON.
+    checkpoint_attributes = (
+        "generation", "previous_generation_score", "best_of_previous", "hidden_layer_count", "network_structure",
+        "mutation_chance", "mutation_severity", "population_size", "current_specimen", "evolution_mode", "replacement",
+        "births", "pipeline_threshold", "lazy_breeding", "materialised_specimen", "activation_function",
+        "breeding_function_name", "selection_function_name", "tournament_size", "record_lineage", "lineage_filename", "dtype",
+    )
+
+    def __init__(self, hidden_layer_count: int, network_structure: list, population_size: int = 5000, mutation_chance: float = 0.02, mutation_severity: int = None, activation_function="tanh", breeding_function="crossover", console_log_level=logging.INFO, file_log_level=None, selection_function="roulette", tournament_size: int = 3, seed=None, evolution_mode="generational", replacement="worst", pipeline_threshold: float = None, lazy_breeding: bool = False, record_lineage: bool = False, lineage_filename: str = "GeNN.lineage", dtype="float64"):
+        # Make a logger if requested.
+        self.setup_logger(console_log_level, file_log_level)
 
-            if file_log_level is not None:
-                file_handler.setFormatter(log_format)
-                self.logger.addHandler(file_handler)
+        # Make a random generator that is seeded once, so runs can be reproduced and resumed.
+        self.rng = rng.RNG(seed)
 
         # Keep track of the generation being trained and some scoring of the previous generation.
         self.generation = 0
@@ -44,12 +48,7 @@ class GeNNetic:
         # Store the mutation settings.
         self.mutation_chance = mutation_chance
 
-        # Choose a mutation function.
-        if mutation_severity is not None:
-            self.mutation_severity = mutation_severity
-            self.mutation_func = self.mutate
-        else:
-            self.mutation_func = self.mutate_all
+        self.mutation_severity = mutation_severity
 
         # Store the population size
         self.population_size = population_size
@@ -57,17 +56,118 @@ class GeNNetic:
         # Keep track of the current nnetwork being assessed.
         self.current_specimen = 0
 
+        # Specimens that have not been handed out to an evaluator yet, see acquire_specimen().
+        self.unassigned_specimen = collections.deque(range(self.population_size))
+
+        # In "generational" mode, the whole population is replaced once every specimen has been scored.
+        # In "steady_state" mode, every result replaces one specimen by a child straight away.
+        # Which specimen is replaced is decided by replacement: the "worst" or the "oldest" one.
+        if evolution_mode not in ("generational", "steady_state"):
+            raise ValueError(f"Unknown evolution mode {evolution_mode}.")
+        if replacement not in ("worst", "oldest"):
+            raise ValueError(f"Unknown replacement {replacement}.")
+
+        self.evolution_mode = evolution_mode
+        self.replacement = replacement
+
+        # Keep track of how many children were born in steady-state mode, and when every specimen was born.
+        self.births = 0
+        self.specimen_birth = np.zeros(self.population_size, dtype=np.int64)
+
+        # In generational mode, the next generation can be bred in the background once pipeline_threshold of
+        # the population has been scored, so there is hardly a pause when the last result comes in.
+        self.pipeline_threshold = pipeline_threshold
+        self.breeding_pipeline = None
+        if pipeline_threshold is not None:
+            if self.evolution_mode != "generational":
+                raise ValueError("Pipelined breeding only works in generational mode.")
+
+            self.breeding_pipeline = pipeline.BreedingPipeline(pipeline_threshold)
+
+        # With lazy breeding, only the parents are chosen when a generation flips.
+        # Every child is made in place of its predecessor when it is reached, see materialise_specimen().
+        # lazy_parents holds, per child, the rows of both its parents and, per row, the last child that needs it.
+        # A parent row is only copied to lazy_saved_rows when it is overwritten before its last child is made.
+        if lazy_breeding and (self.evolution_mode != "generational" or self.breeding_pipeline is not None):
+            raise ValueError("Lazy breeding only works in generational mode without a breeding pipeline.")
+
+        self.lazy_breeding = lazy_breeding
+        self.lazy_parents = None
+        self.lazy_saved_rows = {}
+        self.materialised_specimen = self.population_size
+
         # Update nnetwork settings.
         self.activation_function = activation_function
 
-        self.breeding_function = breeding.breeding_functions[breeding_function]
+        # Choose how parents are bred and selected, and how children are mutated.
+        self.breeding_function_name = breeding_function
+        self.selection_function_name = selection_function
+        self.tournament_size = tournament_size
+        self.choose_functions()
+
+        # Store the weights and biases of the whole population in one contiguous array.
+        # The networks in the specimen list are views on the rows of that array.
+        # The genomes are stored as dtype: "float64", "float32" or "float16". The smaller types are computed in float32.
+        self.dtype = np.dtype(dtype).name
+        self.genomes = GenomeStore(self.network_structure[:self.hidden_layer_count + 2], self.population_size, self.dtype)
 
         # Make a list of networks in the current generation.
         self.specimen = []
         self.specimen_fitness = {}
         self.reset_generation()
 
-        self.log(f"Setting up population with: Size: {self.population_size}, Mutation: {self.mutation_chance * 100}%, Structure: {repr(self.network_structure)}")
+        # Optionally keep the history of every individual, see nnetwork.util.lineage.
+        # It is written to files starting with lineage_filename as it is recorded.
+        # specimen_individual holds the lineage id of the individual in every row.
+        self.record_lineage = record_lineage
+        self.lineage_filename = lineage_filename
+        self.lineage = None
+        self.specimen_individual = None
+        if record_lineage:
+            self.lineage = lineage.LineageRecorder(self.lineage_filename, self.genomes.layout, dtype=self.dtype)
+            self.specimen_individual = self.lineage.record_roots(self.genomes.genomes)
+
+        self.log(f"Setting up population with: Size: {self.population_size}, Mutation: {self.mutation_chance * 100}%, Structure: {repr(self.network_structure)}, Type: {self.dtype}")
+
+    def setup_logger(self, console_log_level=logging.INFO, file_log_level=None):
+        if console_log_level is None and file_log_level is None:
+            return
+
+        self.logger = logging.getLogger("GeNN")
+        self.logger.setLevel(logging.DEBUG)
+
+        if console_log_level is not None:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(console_log_level)
+
+        if file_log_level is not None:
+            file_handler = logging.FileHandler("GeNN.log", mode='w')
+            file_handler.setLevel(file_log_level)
+
+        log_format = logging.Formatter("[%(name)s] %(asctime)s: %(levelname)s - %(message)s")
+
+        if console_log_level is not None:
+            console_handler.setFormatter(log_format)
+            self.logger.addHandler(console_handler)
+
+        if file_log_level is not None:
+            file_handler.setFormatter(log_format)
+            self.logger.addHandler(file_handler)
+
+    # Look up the breeding, selection and mutation functions by their settings.
+    def choose_functions(self):
+        self.breeding_function = breeding.breeding_functions[self.breeding_function_name]
+        self.batch_breeding_function = breeding.batch_breeding_functions[self.breeding_function_name]
+
+        self.selection_function = selection.selection_functions[self.selection_function_name]
+
+        # Choose a mutation function.
+        if self.mutation_severity is not None:
+            self.mutation_func = self.mutate
+            self.batch_mutation_func = self.mutate_batch
+        else:
+            self.mutation_func = self.mutate_all
+            self.batch_mutation_func = self.mutate_all_batch
 
     # A helper function to make logging easier.
     def log(self, msg, level=logging.INFO):
@@ -78,11 +178,90 @@ class GeNNetic:
         self.log("Preparing population for first use...")
 
         # Generate the random networks and store them in the specimen list.
-        for _ in range(self.population_size):
-            self.specimen.append(Network(self.hidden_layer_count, self.network_structure, activation_function=self.activation_function))
+        self.genomes.randomise(self.rng.random_array)
+        self.make_specimen()
 
         self.log("Population generated.")
 
+    # Make the specimen list point at the rows of the genome store.
+    def make_specimen(self):
+        self.specimen = self.make_networks(self.genomes.genomes)
+
+    # Make a network for every row of a (population_size, genome_length) genome array. The networks are views on the rows.
+    def make_networks(self, genomes: np.ndarray) -> list:
+        return [Network(self.hidden_layer_count, self.network_structure, activation_function=self.activation_function, genome=genomes[specimen_id], layout=self.genomes.layout) for specimen_id in range(self.population_size)]
+
+    # Push observations through every specimen at once.
+    # Takes either one observation of shape (input_size,), which is given to every specimen,
+    # or one observation per specimen of shape (population_size, input_size).
+    # Returns the outputs of all specimens with shape (population_size, output_size).
+    def predict_population(self, inputs) -> np.ndarray:
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if inputs.ndim == 1:
+            inputs = np.broadcast_to(inputs, (self.population_size, inputs.shape[0]))
+
+        if inputs.shape != (self.population_size, self.network_structure[0]):
+            raise ValueError(f"Expected inputs of shape ({self.network_structure[0]},) or ({self.population_size}, {self.network_structure[0]}), got {inputs.shape}.")
+
+        self.materialise_specimen(self.population_size - 1)
+
+        return self.predict_genomes(self.genomes.genomes, inputs)
+
+    # Make one prediction per row of inputs, each with its own specimen.
+    # The same specimen can appear more than once, so observations of many games can be combined.
+    # Takes (N,) specimen ids and (N, input_size) inputs, and returns (N, output_size) outputs.
+    def predict_specimens(self, specimen_ids, inputs) -> np.ndarray:
+        inputs = np.asarray(inputs, dtype=np.float64)
+        specimen_ids = np.asarray(specimen_ids, dtype=np.intp)
+
+        if inputs.shape != (specimen_ids.shape[0], self.network_structure[0]):
+            raise ValueError(f"Expected inputs of shape ({specimen_ids.shape[0]}, {self.network_structure[0]}), got {inputs.shape}.")
+
+        if specimen_ids.shape[0] == 0:
+            return np.empty((0, self.network_structure[-1]))
+
+        self.materialise_specimen(int(specimen_ids.max()))
+
+        # Grouping the inputs per specimen pays off when specimens have about as many inputs each, at least two on average.
+        # Otherwise every input simply gets the row of its specimen. Counting the distinct ids of a sorted copy is cheap.
+        sorted_ids = np.sort(specimen_ids)
+        unique_count = 1 + int(np.count_nonzero(sorted_ids[1:] != sorted_ids[:-1]))
+
+        if 2 * unique_count > specimen_ids.shape[0]:
+            return self.predict_genomes(self.genomes_of(specimen_ids), inputs)
+
+        unique_ids, inverse, counts = np.unique(specimen_ids, return_inverse=True, return_counts=True)
+        max_count = int(counts.max())
+
+        if unique_count * max_count > 2 * specimen_ids.shape[0]:
+            return self.predict_genomes(self.genomes_of(specimen_ids), inputs)
+
+        # Every specimen is gathered once, however many of the inputs are for it.
+        genomes = self.genomes_of(unique_ids)
+
+        # Give every specimen a (max_count, input_size) block of its inputs, so each of its layers is one matrix product.
+        order = np.argsort(inverse, kind="stable")
+        group_starts = np.cumsum(counts) - counts
+        positions = np.arange(specimen_ids.shape[0]) - group_starts[inverse[order]]
+
+        grouped_inputs = np.zeros((unique_ids.shape[0], max_count, inputs.shape[1]), dtype=inputs.dtype)
+        grouped_inputs[inverse[order], positions] = inputs[order]
+
+        grouped_outputs = self.predict_genomes(genomes, grouped_inputs)
+
+        outputs = np.empty((specimen_ids.shape[0], grouped_outputs.shape[2]), dtype=grouped_outputs.dtype)
+        outputs[order] = grouped_outputs[inverse[order], positions]
+
+        return outputs
+
+    # Get the genomes of many specimens as one (specimens, genome_length) array.
+    def genomes_of(self, specimen_ids) -> np.ndarray:
+        return self.genomes.genomes[specimen_ids]
+
+    # Push each row of inputs through the network of the matching row of genomes.
+    def predict_genomes(self, genomes: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+        return self.genomes.layout.feed_forward(genomes, inputs, self.activation_function)
+
     # The function to determine the fitness of a nnetwork is different each time,
     # so this function needs to be abstract.
     def fitness(self, inputs: list, outputs: list):
@@ -100,21 +279,167 @@ class GeNNetic:
         # Go on to the next specimen.
         self.next_specimen()
 
+    # Evaluate the whole generation with fitness_function(network) -> float on a pool of worker processes,
+    # then breed the next generation. Uses all CPU cores if workers is not given.
+    # The fitness function has to be picklable, so it should be defined at module level.
+    def evaluate_generation(self, fitness_function, workers: int = None) -> dict:
+        self.log(f"Evaluating generation {self.generation}...")
+        self.materialise_specimen(self.population_size - 1)
+
+        # The genomes are already back to back in the genome store.
+        genome_length = self.genomes.layout.genome_length
+        network_structure = self.genomes.layout.network_structure
+        specimen_genomes = [(specimen_id * genome_length, self.hidden_layer_count, network_structure) for specimen_id in range(self.population_size)]
+
+        self.specimen_fitness = parallel.evaluate_genomes(self.genomes.genomes.reshape(-1), specimen_genomes, self.activation_function, fitness_function, workers)
+        fitness = self.specimen_fitness
+        self.finish_generation()
+
+        return fitness
+
+    # Play one episode per specimen in a vectorised environment with population_size instances,
+    # then breed the next generation. The rewards of every specimen are added up as its fitness.
+    # Specimens stop when their episode is over or after their step budget, which is max_steps by default.
+    def evaluate_episodes(self, environment, max_steps: int = 1000, step_budgets=None, action_function=episodes.argmax_actions) -> dict:
+        self.log(f"Playing episodes of generation {self.generation}...")
+        self.materialise_specimen(self.population_size - 1)
+
+        def predict(specimen_ids, observations):
+            # While most specimens still play, running the whole population beats gathering their genomes.
+            if specimen_ids.shape[0] * 2 < self.population_size:
+                return self.predict_specimens(specimen_ids, observations)
+
+            population_observations = np.zeros((self.population_size, observations.shape[1]))
+            population_observations[specimen_ids] = observations
+
+            return self.predict_population(population_observations)[specimen_ids]
+
+        rewards = episodes.run_episodes(predict, environment, self.population_size, max_steps, step_budgets, action_function)
+
+        self.specimen_fitness = dict(enumerate(rewards.tolist()))
+        fitness = self.specimen_fitness
+        self.finish_generation()
+
+        return fitness
+
+    # Breed the next generation once every specimen has been scored.
+    # The whole generation is bred at once, in steady-state mode as well, so none of the scores go unused.
+    def finish_generation(self):
+        # Store the sum of fitness as a generation fitness score.
+        self.previous_generation_score = float(sum(self.specimen_fitness.values()))
+
+        # Make a new generation and start over with its first specimen.
+        self.breed()
+        self.current_specimen = 0
+
+        # In steady-state mode, every specimen but the best was just born. The births are counted on
+        # to the end of a generation, so the next steady-state generation is counted after population_size more births.
+        if self.evolution_mode == "steady_state":
+            self.births = -(-self.births // self.population_size) * self.population_size
+            self.specimen_birth[:] = self.births
+
     # A helper function to shift to the next specimen.
     def next_specimen(self):
+        # In steady-state mode, once every specimen has a score, each result makes room for a child.
+        if self.evolution_mode == "steady_state" and len(self.specimen_fitness) >= self.population_size:
+            self.current_specimen = self.replace_specimen()
+            return
+
+        self.update_pipeline()
+
         # Check if the entire generation has been ran.
         # If it has been, breed the networks to generate a new generation.
         if self.current_specimen >= self.population_size - 1:
-            # Store the sum of fitness as a generation fitness score.
-            self.previous_generation_score = sum(self.specimen_fitness.values())
+            self.finish_generation()
+        else:
+            self.current_specimen += 1
+            self.materialise_specimen(self.current_specimen)
+
+    # Hand out a specimen to an evaluator, so several specimens can be evaluated at the same time.
+    # Returns None if every specimen of this generation has been handed out already.
+    def acquire_specimen(self):
+        if not self.unassigned_specimen:
+            return None
+
+        specimen_id = self.unassigned_specimen.popleft()
+        self.materialise_specimen(specimen_id)
+
+        return specimen_id
+
+    # Give a specimen back without a fitness, for example when its evaluator disconnected.
+    def release_specimen(self, specimen_id: int):
+        if specimen_id not in self.specimen_fitness:
+            self.unassigned_specimen.appendleft(specimen_id)
+
+    # Store the fitness of a handed out specimen.
+    # Once the whole generation has been scored, the next one is bred and True is returned.
+    def report_fitness(self, specimen_id: int, fitness: float) -> bool:
+        self.specimen_fitness[specimen_id] = fitness
+
+        if self.evolution_mode == "steady_state":
+            # Once nothing is left to hand out, every result makes room for a child, so evaluators never wait.
+            if not self.unassigned_specimen:
+                self.unassigned_specimen.append(self.replace_specimen())
+
+            return False
+
+        if len(self.specimen_fitness) < self.population_size:
+            self.update_pipeline()
+            return False
 
-            # Make a new generation.
-            self.breed()
+        self.finish_generation()
 
-            # Reset the counter.
-            self.current_specimen = 0
+        return True
+
+    # Replace a scored specimen by a child of the scored specimens, for steady-state mode.
+    # Returns the id of the child, which still has to be evaluated.
+    def replace_specimen(self) -> int:
+        scored, fitness = self.scored_specimen()
+
+        # Choose the parents among the specimens that have a score.
+        parents1, parents2 = self.choose_parent_pairs(1, scored, fitness)
+        genomes1, genomes2 = self.genomes.genomes[parents1], self.genomes.genomes[parents2]
+        child = self.batch_mutation_func(self.batch_breeding_function(self, genomes1, genomes2))
+        child_individual = self.record_children(parents1, parents2, genomes1, genomes2, child)
+
+        # The best specimen is never replaced.
+        candidates = np.flatnonzero(np.arange(scored.shape[0]) != np.argmax(fitness))
+        if candidates.shape[0] == 0:
+            candidates = np.arange(scored.shape[0])
+
+        if self.replacement == "worst":
+            replaced = scored[candidates[np.argmin(fitness[candidates])]]
         else:
-            self.current_specimen += 1
+            replaced = scored[candidates[np.argmin(self.specimen_birth[scored[candidates]])]]
+
+        # Count a generation every population_size births. It ends before the child takes its place.
+        self.births += 1
+        if self.births % self.population_size == 0:
+            self.previous_generation_score = float(fitness.sum())
+            self.best_of_previous = float(fitness.max())
+
+            self.log(f"Steady-state generation {self.generation + 1}. Average: {fitness.mean()}. Best: {self.best_of_previous}")
+
+            self.end_generation(scored, fitness)
+            self.generation += 1
+
+        # The network in the specimen list is a view, so it sees the child straight away.
+        self.genomes.genomes[replaced] = child[0]
+        del self.specimen_fitness[replaced]
+
+        if child_individual is not None:
+            self.specimen_individual[replaced] = child_individual[0]
+
+        self.specimen_birth[replaced] = self.births
+
+        return int(replaced)
+
+    # Called at the end of every generation, in generational as well as steady-state mode,
+    # with the scored specimens and their scores, before any of them is replaced.
+    # Subclasses can extend it, for example to archive the best networks of every generation.
+    def end_generation(self, scored: np.ndarray, fitness: np.ndarray):
+        if self.lineage is not None:
+            self.lineage.record_generation(self.generation, self.specimen_individual, self.genomes.genomes)
 
     # Breed to networks with crossover.
     def breed(self):
@@ -125,127 +450,349 @@ class GeNNetic:
         specimen_sorted = sorted(self.specimen_fitness.keys(), key=lambda x: self.specimen_fitness[x], reverse=True)
 
         # Store the score of the best nnetwork of the previous generation.
-        self.best_of_previous = self.specimen_fitness[specimen_sorted[0]]
+        self.best_of_previous = float(self.specimen_fitness[specimen_sorted[0]])
 
-        # The best of the generation is copied over without crossover or mutation.
-        # Make a list of the new generation.
-        best_network = self.specimen[specimen_sorted[0]]
-        new_generation = [best_network]
+        self.end_generation(*self.scored_specimen())
+
+        if self.lazy_breeding:
+            # Only choose the parents, the children are made when they are reached.
+            self.start_lazy_generation(specimen_sorted[0])
+        else:
+            # Take the generation that was bred in the background, or breed it from the whole generation now.
+            new_generation = None
+            if self.breeding_pipeline is not None:
+                new_generation = self.breeding_pipeline.collect()
 
-        # Start generating population_size children based on the previous generation
-        for _ in range(self.population_size - 1):
-            parent1 = self.specimen[self.choose_parent()]
-            parent2 = self.specimen[self.choose_parent()]
+            if new_generation is None:
+                new_generation = self.prepare_generation(*self.scored_specimen())
 
-            # Make a child based on the parents.
-            child = self.breeding_function(self, parent1, parent2)
+            new_genomes, new_specimen, children_lineage = new_generation
 
-            # Mutate the child.
-            child = self.mutation_func(child)
+            # The best of the generation is copied over without crossover or mutation.
+            new_genomes[0] = self.genomes.genome(specimen_sorted[0])
 
-            # Add it to the specimen list.
-            new_generation.append(child)
+            # The children are only written to the lineage now, so children that were bred in the background
+            # and thrown away never end up in it.
+            if children_lineage is not None:
+                new_individuals = np.empty(self.population_size, dtype=np.int64)
+                new_individuals[0] = self.specimen_individual[specimen_sorted[0]]
+                new_individuals[1:] = self.lineage.append_children(children_lineage)
+                self.specimen_individual = new_individuals
 
-        # Set the specimen list.
-        self.specimen = new_generation
+            # Set the genomes and the specimen list. The new genome array is contiguous already, so the networks stay views on it.
+            self.genomes.replace(new_genomes)
+            self.specimen = new_specimen
 
         # Add 1 to the generation counter.
         self.generation += 1
 
-        # Reset the fitness dictionary.
+        # Reset the fitness dictionary and hand out the new generation from the start.
         self.specimen_fitness = {}
+        self.unassigned_specimen = collections.deque(range(self.population_size))
 
         self.log("Breeding finished.")
 
+    # The ids of the specimens that have a score, and their scores.
+    def scored_specimen(self) -> tuple:
+        scored = np.fromiter(self.specimen_fitness.keys(), dtype=np.intp, count=len(self.specimen_fitness))
+        fitness = np.fromiter(self.specimen_fitness.values(), dtype=np.float64, count=len(self.specimen_fitness))
+
+        return scored, fitness
+
+    # Make the population_size - 1 mutated children of a new generation, with parents chosen among the scored specimens.
+    # Also returns them encoded for the lineage, or None if the lineage is not recorded. Nothing is written to the lineage yet.
+    def breed_children(self, scored: np.ndarray, fitness: np.ndarray) -> tuple:
+        parents1, parents2 = self.choose_parent_pairs(self.population_size - 1, scored, fitness)
+
+        # Make all children based on their parents at once.
+        genomes1, genomes2 = self.genomes.genomes[parents1], self.genomes.genomes[parents2]
+        children = self.batch_mutation_func(self.batch_breeding_function(self, genomes1, genomes2))
+
+        return children, self.encode_children(parents1, parents2, genomes1, genomes2, children)
+
+    # Encode children for the lineage, with the rows of their parents in the current generation.
+    # Returns None if the lineage is not recorded.
+    def encode_children(self, parents1: np.ndarray, parents2: np.ndarray, genomes1: np.ndarray, genomes2: np.ndarray, children: np.ndarray):
+        if self.lineage is None:
+            return None
+
+        return self.lineage.encode_children(self.specimen_individual[parents1], self.specimen_individual[parents2], genomes1, genomes2, children)
+
+    # Record children in the lineage straight away. Returns their lineage ids, or None if the lineage is not recorded.
+    def record_children(self, parents1: np.ndarray, parents2: np.ndarray, genomes1: np.ndarray, genomes2: np.ndarray, children: np.ndarray):
+        if self.lineage is None:
+            return None
+
+        return self.lineage.append_children(self.encode_children(parents1, parents2, genomes1, genomes2, children))
+
+    # Write the children into a fresh genome array, with row 0 left for the best specimen, and make their networks.
+    # Runs on the background thread of the breeding pipeline, so it only reads the current generation.
+    def prepare_generation(self, scored: np.ndarray, fitness: np.ndarray) -> tuple:
+        children, children_lineage = self.breed_children(scored, fitness)
+
+        new_genomes = np.empty_like(self.genomes.genomes)
+        new_genomes[1:] = children
+
+        return new_genomes, self.make_networks(new_genomes), children_lineage
+
+    # Choose the parents of the next generation without making the children yet.
+    # The children overwrite the old generation in place, so a parent row is only copied if it is overwritten
+    # before its last child is made, and the copy is let go after that.
+    def start_lazy_generation(self, best_id: int):
+        scored, fitness = self.scored_specimen()
+
+        child_count = self.population_size - 1
+        parents1, parents2 = self.choose_parent_pairs(child_count, scored, fitness)
+
+        # Make the children with the lowest parent rows first. Their parents are used up early,
+        # so few rows are still needed when they are overwritten.
+        order = np.argsort(np.minimum(parents1, parents2), kind="stable")
+        parents1, parents2 = parents1[order], parents2[order]
+
+        # Child i is made in row i + 1, because row 0 is the best of the previous generation.
+        # Rows that are no parent get 0, so they are never copied.
+        last_child = np.zeros(self.population_size, dtype=np.intp)
+        np.maximum.at(last_child, parents1, np.arange(1, self.population_size))
+        np.maximum.at(last_child, parents2, np.arange(1, self.population_size))
+
+        self.lazy_parents = (parents1, parents2, last_child)
+        self.lazy_saved_rows = {}
+
+        # The lineage ids of the previous generation, since their rows are overwritten.
+        if self.lineage is not None:
+            self.lazy_parent_individuals = self.specimen_individual.copy()
+            self.specimen_individual[0] = self.specimen_individual[best_id]
+
+        # The best of the generation is copied over without crossover or mutation, so it is ready straight away.
+        self.save_lazy_rows(0, 1)
+        self.genomes.genomes[0] = self.genomes.genomes[best_id]
+        self.materialised_specimen = 1
+
+    # Copy the parent rows from start to end that are about to be overwritten, if a child after them still needs them.
+    def save_lazy_rows(self, start: int, end: int):
+        last_child = self.lazy_parents[2]
+
+        for row in (start + np.flatnonzero(last_child[start:end] >= end)).tolist():
+            self.lazy_saved_rows[row] = self.genomes.genomes[row].copy()
+
+    # Get the genomes of parent rows of the previous generation, with the rows before overwritten_end overwritten already.
+    def lazy_parent_genomes(self, rows: np.ndarray, overwritten_end: int) -> np.ndarray:
+        genomes = self.genomes.genomes[rows]
+
+        for index in np.flatnonzero(rows < overwritten_end).tolist():
+            genomes[index] = self.lazy_saved_rows[int(rows[index])]
+
+        return genomes
+
+    # Make sure the children up to and including specimen_id have been made. Does nothing unless lazy breeding is waiting.
+    # Children are always made a whole chunk at a time, see LAZY_CHUNK_SIZE.
+    def materialise_specimen(self, specimen_id: int):
+        if self.lazy_parents is None or specimen_id < self.materialised_specimen:
+            return
+
+        parents1, parents2, last_child = self.lazy_parents
+
+        while self.materialised_specimen <= specimen_id:
+            start = self.materialised_specimen
+            end = min(start + LAZY_CHUNK_SIZE, self.population_size)
+
+            # Child i has the parents at index i - 1, because row 0 is the best of the previous generation.
+            rows1, rows2 = parents1[start - 1:end - 1], parents2[start - 1:end - 1]
+            genomes1, genomes2 = self.lazy_parent_genomes(rows1, start), self.lazy_parent_genomes(rows2, start)
+            children = self.batch_mutation_func(self.batch_breeding_function(self, genomes1, genomes2))
+
+            self.save_lazy_rows(start, end)
+            self.genomes.genomes[start:end] = children
+
+            if self.lineage is not None:
+                self.specimen_individual[start:end] = self.lineage.record_children(self.lazy_parent_individuals[rows1], self.lazy_parent_individuals[rows2], genomes1, genomes2, children)
+
+            # Let go of the copied rows that no child needs anymore.
+            for row in [row for row in self.lazy_saved_rows if last_child[row] < end]:
+                del self.lazy_saved_rows[row]
+
+            self.materialised_specimen = end
+
+        # Nothing is kept once every child has been made.
+        if self.materialised_specimen >= self.population_size:
+            self.lazy_parents = None
+            self.lazy_saved_rows = {}
+            self.lazy_parent_individuals = None
+
+    # Start breeding the next generation in the background once enough of this one has been scored.
+    # The genomes are not changed until breed() takes the children, so the tail can still be evaluated.
+    def update_pipeline(self):
+        if self.breeding_pipeline is None or not self.breeding_pipeline.ready(len(self.specimen_fitness), self.population_size):
+            return
+
+        scored, fitness = self.scored_specimen()
+        self.log(f"Breeding generation {self.generation + 1} in the background from {scored.shape[0]} scored specimens...", level=logging.DEBUG)
+
+        self.breeding_pipeline.start(lambda: self.prepare_generation(scored, fitness))
+
     # A function to choose a parent.
     def choose_parent(self):
-        # Generate a random choosing point.
-        fitness_sum = math.floor(sum(self.specimen_fitness.values()))
-        passing_point = rng.randint(0, fitness_sum)
+        return int(self.choose_parents(1)[0])
 
-        # Keep track of a running sum
-        running_sum = 0
+    # A function to choose many parents at once with the selection function.
+    # The parents are chosen among the specimens that have a score, the scored_specimen() of now unless given.
+    def choose_parents(self, count: int, scored: np.ndarray = None, fitness: np.ndarray = None) -> np.ndarray:
+        if scored is None:
+            scored, fitness = self.scored_specimen()
 
-        for specimen_id in range(len(self.specimen)):
-            # Add the current fitness to the running sum.
-            running_sum += self.specimen_fitness[specimen_id]
+        return scored[self.selection_function(self, fitness, count)]
 
-            # Check if the running sum passed the passing point.
-            # If it has, return the specimen id that passed.
-            if running_sum > passing_point:
-                self.log(f"Parent {specimen_id} has been chosen with fitness {self.specimen_fitness[specimen_id]}", level=logging.DEBUG)
-                return specimen_id
+    # Choose the parents of pair_count children in one go.
+    def choose_parent_pairs(self, pair_count: int, scored: np.ndarray = None, fitness: np.ndarray = None) -> tuple:
+        parents = self.choose_parents(2 * pair_count, scored, fitness)
+
+        return parents[:pair_count], parents[pair_count:]
 
     # A function to apply random mutation to networks to provide the genetic variation.
     def mutate(self, network):
+        # Mutate the genome in place as a batch of one.
+        self.mutate_batch(network.genome[np.newaxis])
+
+        return network
+
+    # Mutate a (children, genome_length) array of genomes in place.
+    def mutate_batch(self, genomes: np.ndarray) -> np.ndarray:
         self.log("Starting mutation...", level=logging.DEBUG)
 
-        # Only mutate if the chance is met.
-        if rng.random_number() <= self.mutation_chance:
+        layout = self.genomes.layout
+        layer_count = len(layout.network_structure)
+        network_structure = np.array(layout.network_structure)
 
-            # Mutate self.mutation_severity times
-            for _ in range(self.mutation_severity):
-                # Get the neuron that is going to be mutated.
-                mutation_layer = rng.randint(0, len(network.layers) - 1)
-                mutation_neuron = rng.randint(0, len(network.layers[mutation_layer]) - 1)
+        # Only mutate the genomes where the chance is met.
+        mutated = np.flatnonzero(self.rng.random_array(genomes.shape[0]) <= self.mutation_chance)
+        shape = (mutated.shape[0], self.mutation_severity)
 
-                # Mutate the bias or mutate the weight?
-                mutate_bias = rng.randint(0, 1) == 1
+        # Get the neurons that are going to be mutated, self.mutation_severity per genome.
+        mutation_layers = self.rng.randint_array(0, layer_count - 1, shape)
+        mutation_neurons = (self.rng.random_array(shape) * network_structure[mutation_layers]).astype(np.intp)
 
-                if mutate_bias:
-                    # Mutate the bias to a new random value between -1 and 1.
-                    network.layers[mutation_layer][mutation_neuron].bias = rng.random_number() * 2 - 1
-                else:
-                    # Cannot mutate a connection that doesn't exist (for example a neuron in the output layer). Perform that check first.
-                    if len(network.layers[mutation_layer][mutation_neuron].connections) <= 0:
-                        continue
+        # Mutate the bias or mutate the weight?
+        mutate_bias = self.rng.randint_array(0, 1, shape) == 1
 
-                    mutation_connection = rng.randint(0, len(network.layers[mutation_layer][mutation_neuron].connections) - 1)
+        # Cannot mutate a connection that doesn't exist (for example a neuron in the output layer).
+        mutate_weight = ~mutate_bias & (mutation_layers < layer_count - 1)
 
-                    # Add the mutation to the current value, to make a small change.
-                    # Have a maximum value of 1 and a minimum of -1.
-                    current_weight = network.layers[mutation_layer][mutation_neuron].connections[mutation_connection][1]
-                    weight_delta = max(-1, min(current_weight + rng.random_gaussian() / 5, 1))
-                    network.layers[mutation_layer][mutation_neuron].connections[mutation_connection][1] += weight_delta
+        # Mutate the biases to a new random value between -1 and 1.
+        bias_offsets = np.array(layout.bias_offsets)[mutation_layers] + mutation_neurons
+        rows = np.broadcast_to(mutated[:, np.newaxis], shape)
+        genomes[rows[mutate_bias], bias_offsets[mutate_bias]] = self.rng.random_array(np.count_nonzero(mutate_bias)) * 2 - 1
 
-        return network
+        # Add a small change to the weights, with a maximum value of 1 and a minimum of -1.
+        weight_layers = mutation_layers[mutate_weight]
+        next_layer_sizes = network_structure[weight_layers + 1]
+        mutation_connections = (self.rng.random_array(weight_layers.shape) * next_layer_sizes).astype(np.intp)
+        weight_offsets = np.array(layout.weight_offsets)[weight_layers] + mutation_neurons[mutate_weight] * next_layer_sizes + mutation_connections
+
+        weight_rows = rows[mutate_weight]
+        current_weights = genomes[weight_rows, weight_offsets]
+        genomes[weight_rows, weight_offsets] = np.clip(current_weights + self.rng.random_gaussian_array(current_weights.shape) / 5, -1, 1)
+
+        return genomes
 
     # A function to apply mutation randomly to networks to provide the genetic variation.
     def mutate_all(self, network):
+        # Mutate the genome in place as a batch of one.
+        self.mutate_all_batch(network.genome[np.newaxis])
+
+        return network
+
+    # Mutate a (children, genome_length) array of genomes in place.
+    def mutate_all_batch(self, genomes: np.ndarray) -> np.ndarray:
         self.log("Starting mutation...", level=logging.DEBUG)
 
-        for layer_index in range(len(network.layers)):
-            for neuron_index in range(len(network.layers[layer_index])):
-                # Only mutate bias if chance is met.
-                if rng.random_number() <= self.mutation_chance:
-                    # Get the current bias.
-                    current_bias = network.layers[layer_index][neuron_index].bias
+        # Every bias and weight is mutated if the chance is met.
+        mutation_mask = self.rng.random_array(genomes.shape) <= self.mutation_chance
 
-                    # Add a random Gaussian variable to that.
-                    new_bias = current_bias + rng.random_gaussian() / 5
+        # Add a random Gaussian variable to them, with a max of 1 and a min of -1.
+        current_values = genomes[mutation_mask]
+        genomes[mutation_mask] = np.clip(current_values + self.rng.random_gaussian_array(current_values.shape) / 5, -1, 1)
 
-                    # Set the new bias (with a max of 1 and a min of -1)
-                    network.layers[layer_index][neuron_index].bias = max(-1, min(1, current_bias + new_bias))
+        return genomes
 
-                # Go through the connections to mutate them.
-                for connection_index in range(len(network.layers[layer_index][neuron_index].connections)):
-                    # Only mutate if chance is met.
-                    if rng.random_number() <= self.mutation_chance:
-                        # Get the current weight.
-                        current_weight = network.layers[layer_index][neuron_index].connections[connection_index][1]
+    # The specimen list is made of views on the genome store, so it does not need to be pickled.
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["specimen"]
 
-                        # Add a random Gaussian variable to that.
-                        new_weight = current_weight + rng.random_gaussian() / 5
+        return state
 
-                        # Set the new weight (with a max of 1 and a min of -1).
-                        network.layers[layer_index][neuron_index].connections[connection_index][1] = max(-1, min(1, new_weight))
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.make_specimen()
 
-        return network
+    # Save the population, the scores and the random state to a checkpoint file, see nnetwork.util.checkpoint.
+    def save_network(self, filename: str = "GeNN.checkpoint"):
+        # Breeding in the background changes the random state, so it is stopped first. It starts again when it is needed.
+        if self.breeding_pipeline is not None:
+            self.breeding_pipeline.cancel()
+
+        # Make sure no child is missing from the saved generation.
+        self.materialise_specimen(self.population_size - 1)
+
+        header = {
+            "class": type(self).__name__,
+            "attributes": {name: getattr(self, name) for name in self.checkpoint_attributes},
+            "rng": self.rng.get_state(),
+        }
+
+        scored, fitness = self.scored_specimen()
+        arrays = {
+            "genomes": self.genomes.genomes,
+            "specimen_birth": self.specimen_birth,
+            "scored": scored,
+            "fitness": fitness,
+            "unassigned_specimen": np.array(self.unassigned_specimen, dtype=np.intp),
+        }
+
+        # The lineage is already on disk, only how far it got has to be stored.
+        if self.lineage is not None:
+            arrays["specimen_individual"] = self.specimen_individual
+            arrays["lineage_lengths"] = np.array(self.lineage.lengths(), dtype=np.int64)
+
+        checkpoint.save(filename, header, arrays)
+
+    # Load a checkpoint made by save_network(). The genomes are memory mapped, so this is fast even for big populations.
+    @classmethod
+    def load_network(cls, filename: str = "GeNN.checkpoint", console_log_level=logging.INFO, file_log_level=None):
+        header, arrays = checkpoint.load(filename)
+
+        genn = cls.__new__(cls)
+        genn.setup_logger(console_log_level, file_log_level)
+        genn.__dict__.update(header["attributes"])
+
+        genn.rng = rng.RNG()
+        genn.rng.set_state(header["rng"])
+        genn.choose_functions()
+
+        genn.breeding_pipeline = None
+        if genn.pipeline_threshold is not None:
+            genn.breeding_pipeline = pipeline.BreedingPipeline(genn.pipeline_threshold)
+
+        genn.lazy_parents = None
+        genn.lazy_saved_rows = {}
+
+        genn.genomes = GenomeStore(genn.network_structure[:genn.hidden_layer_count + 2], genn.population_size, genn.dtype)
+        genn.genomes.replace(arrays["genomes"])
+        genn.make_specimen()
+
+        genn.specimen_birth = np.array(arrays["specimen_birth"])
+        genn.specimen_fitness = dict(zip(arrays["scored"].tolist(), arrays["fitness"].tolist()))
+        genn.unassigned_specimen = collections.deque(arrays["unassigned_specimen"].tolist())
+
+        genn.lineage = None
+        genn.specimen_individual = None
+        if genn.record_lineage:
+            # Continue the lineage files, without what was recorded after the checkpoint was saved.
+            genn.lineage = lineage.LineageRecorder(genn.lineage_filename, genn.genomes.layout, dtype=genn.dtype, truncate=False)
+            genn.lineage.truncate(arrays["lineage_lengths"].tolist())
+            genn.specimen_individual = np.array(arrays["specimen_individual"])
+
+        genn.log(f"Loaded generation {genn.generation} from {filename}.")
 
-    # Save the nnetwork to a file.
-    def save_network(self, filename: str = "GeNN.pickle"):
-        # Open the file.
-        with open(filename, "wb") as fp:
-            # Store it as pickle object.
-            pickle.dump(self, fp)
+        return genn
 
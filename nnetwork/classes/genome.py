@@ -0,0 +1,188 @@
+import numpy as np
+
+from nnetwork.util.neuralnet import activation
+
+
+# The types genomes can be stored as. Float64 genomes are computed in float64, the smaller types in float32.
+STORAGE_DTYPES = ("float64", "float32", "float16")
+
+# The amount of genomes that are turned into the compute type at once by feed_forward.
+CONVERSION_CHUNK_SIZE = 256
+
+
+# Get the type the values of a network are computed in, for genomes stored as storage_dtype.
+def compute_dtype(storage_dtype) -> np.dtype:
+    storage_dtype = np.dtype(storage_dtype)
+
+    if storage_dtype.name not in STORAGE_DTYPES:
+        raise ValueError(f"Unknown storage type {storage_dtype.name}, expected one of {', '.join(STORAGE_DTYPES)}.")
+
+    if storage_dtype == np.float64:
+        return storage_dtype
+
+    return np.dtype(np.float32)
+
+
+class GenomeLayout:
+    def __init__(self, network_structure: list):
+        # Store the amount of neurons per layer.
+        self.network_structure = list(network_structure)
+
+        # A genome stores, per layer, the biases of the layer followed by its outgoing weights.
+        # The weights of a layer form a (neurons in layer, neurons in next layer) matrix in row-major order.
+        self.bias_offsets = []
+        self.weight_offsets = []
+
+        offset = 0
+        for layer_index in range(len(self.network_structure)):
+            self.bias_offsets.append(offset)
+            offset += self.network_structure[layer_index]
+
+            # The output layer has no outgoing weights.
+            if layer_index < len(self.network_structure) - 1:
+                self.weight_offsets.append(offset)
+                offset += self.network_structure[layer_index] * self.network_structure[layer_index + 1]
+
+        self.genome_length = offset
+
+        # Keep track of which neuron every gene belongs to: its bias and its outgoing weights.
+        # Neurons are numbered from the input layer to the output layer.
+        # Breeding uses this to turn a per-neuron mask into a per-gene mask.
+        self.neuron_count = sum(self.network_structure)
+        self.gene_neurons = np.empty(self.genome_length, dtype=np.intp)
+
+        first_neuron = 0
+        for layer_index in range(len(self.network_structure)):
+            neuron_count = self.network_structure[layer_index]
+            layer_neurons = np.arange(first_neuron, first_neuron + neuron_count)
+
+            self.bias_vector(self.gene_neurons, layer_index)[:] = layer_neurons
+            if layer_index < len(self.network_structure) - 1:
+                self.weight_matrix(self.gene_neurons, layer_index)[:] = layer_neurons[:, np.newaxis]
+
+            first_neuron += neuron_count
+
+    # Get a view of the weight matrix of a layer.
+    # Works for a single genome as well as for a (population, genome_length) array,
+    # in which case the result has shape (population, in, out).
+    def weight_matrix(self, genomes: np.ndarray, layer_index: int) -> np.ndarray:
+        rows = self.network_structure[layer_index]
+        columns = self.network_structure[layer_index + 1]
+        start = self.weight_offsets[layer_index]
+
+        return genomes[..., start:start + rows * columns].reshape(genomes.shape[:-1] + (rows, columns))
+
+    # Get a view of the bias vector of a layer.
+    def bias_vector(self, genomes: np.ndarray, layer_index: int) -> np.ndarray:
+        start = self.bias_offsets[layer_index]
+
+        return genomes[..., start:start + self.network_structure[layer_index]]
+
+    # Get views of all weight matrices.
+    def weight_matrices(self, genomes: np.ndarray) -> list:
+        return [self.weight_matrix(genomes, layer_index) for layer_index in range(len(self.network_structure) - 1)]
+
+    # Get views of all bias vectors.
+    def bias_vectors(self, genomes: np.ndarray) -> list:
+        return [self.bias_vector(genomes, layer_index) for layer_index in range(len(self.network_structure))]
+
+    # Match the layers of this layout to those of another layout, for networks with a different structure.
+    # The input and hidden layers are matched from the input side, the output layers are matched to each other.
+    # Returns, for every layer of the other layout, the matching layer of this layout, or None.
+    def matching_layers(self, target_layout) -> list:
+        layer_count = len(self.network_structure)
+        target_layer_count = len(target_layout.network_structure)
+
+        matches = []
+        for layer_index in range(target_layer_count):
+            if layer_index == target_layer_count - 1:
+                matches.append(layer_count - 1)
+            elif layer_index < layer_count - 1:
+                matches.append(layer_index)
+            else:
+                matches.append(None)
+
+        return matches
+
+    # Copy the genes of a genome of this layout into target_genome, a genome of target_layout, where they fit.
+    # Neurons of matching layers are matched by their index, and so are the connections between them.
+    # Weights are only copied between two layers that follow each other in both layouts.
+    def copy_genes(self, genome: np.ndarray, target_layout, target_genome: np.ndarray):
+        matches = self.matching_layers(target_layout)
+
+        for layer_index, source_index in enumerate(matches):
+            if source_index is None:
+                continue
+
+            neurons = min(self.network_structure[source_index], target_layout.network_structure[layer_index])
+            target_layout.bias_vector(target_genome, layer_index)[:neurons] = self.bias_vector(genome, source_index)[:neurons]
+
+            if layer_index == len(matches) - 1 or matches[layer_index + 1] != source_index + 1:
+                continue
+
+            connections = min(self.network_structure[source_index + 1], target_layout.network_structure[layer_index + 1])
+            target_layout.weight_matrix(target_genome, layer_index)[:neurons, :connections] = self.weight_matrix(genome, source_index)[:neurons, :connections]
+
+    # Push each row of inputs through the network of the matching row of genomes.
+    # The inputs have shape (rows, input_size), or (rows, k, input_size) to push k inputs through every network at once.
+    def feed_forward(self, genomes: np.ndarray, inputs: np.ndarray, activation_function: str) -> np.ndarray:
+        dtype = compute_dtype(genomes.dtype)
+        inputs = np.asarray(inputs, dtype=dtype)
+
+        # Float16 genomes are turned into float32 a chunk at a time, so the converted copy stays small.
+        if genomes.dtype != dtype:
+            outputs = np.empty(inputs.shape[:-1] + (self.network_structure[-1],), dtype=dtype)
+
+            for start in range(0, genomes.shape[0], CONVERSION_CHUNK_SIZE):
+                end = start + CONVERSION_CHUNK_SIZE
+                outputs[start:end] = self.feed_forward(genomes[start:end].astype(dtype), inputs[start:end], activation_function)
+
+            return outputs
+
+        # A single input per network is a batch of one.
+        if inputs.ndim == 2:
+            return self.feed_forward(genomes, inputs[:, np.newaxis, :], activation_function)[:, 0, :]
+
+        activation_function = activation.array_activation_functions[activation_function]
+
+        # Views of the (rows, in, out) weight tensors and (rows, neurons) bias matrices.
+        weight_matrices = self.weight_matrices(genomes)
+        bias_vectors = self.bias_vectors(genomes)
+
+        # The input neurons also run their input through the activation function.
+        values = activation_function(inputs)
+
+        for layer_index in range(len(weight_matrices)):
+            # A neuron only feeds forward if its value is above its bias.
+            gated_values = np.where(values > bias_vectors[layer_index][:, np.newaxis, :], values, 0)
+
+            # Batched matrix multiplication: (rows, k, in) @ (rows, in, out).
+            values = activation_function(np.matmul(gated_values, weight_matrices[layer_index]))
+
+        return values
+
+
+class GenomeStore:
+    def __init__(self, network_structure: list, population_size: int, dtype="float64"):
+        # Keep track of where every weight and bias lives in a genome.
+        self.layout = GenomeLayout(network_structure)
+        self.population_size = population_size
+
+        # One contiguous row per specimen. Every gene is between -1 and 1, so float32 or float16 is often precise enough.
+        compute_dtype(dtype)
+        self.genomes = np.zeros((population_size, self.layout.genome_length), dtype=dtype)
+
+    # Fill the store with random weights and biases between -1 and 1.
+    def randomise(self, random_array):
+        self.genomes[:] = random_array(self.genomes.shape) * 2 - 1
+
+    # Swap in a new array of genomes, for example a freshly bred generation.
+    def replace(self, genomes: np.ndarray):
+        if genomes.shape != self.genomes.shape:
+            raise ValueError(f"Expected genomes of shape {self.genomes.shape}, got {genomes.shape}.")
+
+        self.genomes = np.ascontiguousarray(genomes, dtype=self.genomes.dtype)
+
+    # Get the genome of a single specimen. This is a view, not a copy.
+    def genome(self, specimen_id: int) -> np.ndarray:
+        return self.genomes[specimen_id]
@@ -1,36 +1,32 @@
 import logging
-import math
-import pickle
+import numpy as np
 
+from nnetwork.classes.genome import GenomeLayout
 from nnetwork.classes.neuralnet import Network
 from nnetwork.util.neat import breeding
+from nnetwork.util import checkpoint
+from nnetwork.util import episodes
+from nnetwork.util import parallel
+from nnetwork.util import pipeline
 from nnetwork.util import rng
+from nnetwork.util import selection
 
 
 class NEAT:
-    def __init__(self, input_size, output_size, population_size: int = 5000, mutation_chance: float = 0.02, mutation_severity: int = None, activation_function="tanh", breeding_function="crossover", console_log_level=logging.INFO, file_log_level=None):
+    # The settings and counters that are stored in the header of a checkpoint.
+    # Subclasses can add their own, as long as they can be stored as JSON.
+    checkpoint_attributes = (
+        "generation", "previous_generation_score", "best_of_previous", "input_size", "output_size",
+        "mutation_chance", "mutation_severity", "population_size", "current_specimen", "pipeline_threshold",
+        "activation_function", "breeding_function_name", "selection_function_name", "tournament_size",
+    )
+
+    def __init__(self, input_size, output_size, population_size: int = 5000, mutation_chance: float = 0.02, mutation_severity: int = None, activation_function="tanh", breeding_function="crossover", console_log_level=logging.INFO, file_log_level=None, selection_function="roulette", tournament_size: int = 3, seed=None, pipeline_threshold: float = None):
         # Make a logger if requested.
-        if console_log_level is not None or file_log_level is not None:
-            self.logger = logging.getLogger("NEAT")
-            self.logger.setLevel(logging.DEBUG)
+        self.setup_logger(console_log_level, file_log_level)
 
-            if console_log_level is not None:
-                console_handler = logging.StreamHandler()
-                console_handler.setLevel(console_log_level)
-
-            if file_log_level is not None:
-                file_handler = logging.FileHandler("NEAT.log", mode='w')
-                file_handler.setLevel(file_log_level)
-
-            log_format = logging.Formatter("[%(name)s] %(asctime)s: %(levelname)s - %(message)s")
-
-            if console_log_level is not None:
-                console_handler.setFormatter(log_format)
-                self.logger.addHandler(console_handler)
-
-            if file_log_level is not None:
-                file_handler.setFormatter(log_format)
-                self.logger.addHandler(file_handler)
+        # Make a random generator that is seeded once, so runs can be reproduced and resumed.
+        self.rng = rng.RNG(seed)
 
         # Keep track of the generation being trained and some scoring of the previous generation.
         self.generation = 0
@@ -44,12 +40,7 @@ class NEAT:
         # Store the mutation settings.
         self.mutation_chance = mutation_chance
 
-        # Choose a mutation function.
-        if mutation_severity is not None:
-            self.mutation_severity = mutation_severity
-            self.mutation_func = self.mutate
-        else:
-            self.mutation_func = self.mutate_all
+        self.mutation_severity = mutation_severity
 
         # Store the population size
         self.population_size = population_size
@@ -57,10 +48,20 @@ class NEAT:
         # Keep track of the current nnetwork being assessed.
         self.current_specimen = 0
 
+        # The next generation can be bred in the background once pipeline_threshold of the population has been scored.
+        self.pipeline_threshold = pipeline_threshold
+        self.breeding_pipeline = None
+        if pipeline_threshold is not None:
+            self.breeding_pipeline = pipeline.BreedingPipeline(pipeline_threshold)
+
         # Update nnetwork settings.
         self.activation_function = activation_function
 
-        self.breeding_function = breeding.breeding_functions[breeding_function]
+        # Choose how parents are bred and selected, and how children are mutated.
+        self.breeding_function_name = breeding_function
+        self.selection_function_name = selection_function
+        self.tournament_size = tournament_size
+        self.choose_functions()
 
         # Make a list of networks in the current generation.
         self.specimen = []
@@ -69,6 +70,42 @@ class NEAT:
 
         self.log(f"Setting up population with: Size: {self.population_size}, Mutation: {self.mutation_chance * 100}%")
 
+    def setup_logger(self, console_log_level=logging.INFO, file_log_level=None):
+        if console_log_level is None and file_log_level is None:
+            return
+
+        self.logger = logging.getLogger("NEAT")
+        self.logger.setLevel(logging.DEBUG)
+
+        if console_log_level is not None:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(console_log_level)
+
+        if file_log_level is not None:
+            file_handler = logging.FileHandler("NEAT.log", mode='w')
+            file_handler.setLevel(file_log_level)
+
+        log_format = logging.Formatter("[%(name)s] %(asctime)s: %(levelname)s - %(message)s")
+
+        if console_log_level is not None:
+            console_handler.setFormatter(log_format)
+            self.logger.addHandler(console_handler)
+
+        if file_log_level is not None:
+            file_handler.setFormatter(log_format)
+            self.logger.addHandler(file_handler)
+
+    # Look up the breeding, selection and mutation functions by their settings.
+    def choose_functions(self):
+        self.breeding_function = breeding.breeding_functions[self.breeding_function_name]
+        self.selection_function = selection.selection_functions[self.selection_function_name]
+
+        # Choose a mutation function.
+        if self.mutation_severity is not None:
+            self.mutation_func = self.mutate
+        else:
+            self.mutation_func = self.mutate_all
+
     # A helper function to make logging easier.
     def log(self, msg, level=logging.INFO):
         self.logger.log(level, msg)
@@ -82,17 +119,16 @@ class NEAT:
             # First generate a nnetwork structure randomly.
             # Rounding happens because there can be no float count of layers.
             # The max happens because there can be no negative counts.
-            hidden_layer_count = round(max(0, rng.random_gaussian(mean=0, std_deviation=2)))
+            hidden_layer_count = round(max(0, self.rng.random_gaussian(mean=0, std_deviation=2)))
 
             # Make a random amount of neurons per layer.
             network_structure = [self.input_size]
             for _ in range(hidden_layer_count):
-                neurons = round(max(0, rng.random_gaussian(mean=5, std_deviation=5)))
+                neurons = round(max(0, self.rng.random_gaussian(mean=5, std_deviation=5)))
                 network_structure.append(neurons)
             network_structure.append(self.output_size)
 
-            network = Network(hidden_layer_count, network_structure, activation_function=self.activation_function)
-            network.structure = (hidden_layer_count, network_structure, network.get_weights_and_biases())
+            network = Network(hidden_layer_count, network_structure, activation_function=self.activation_function, random_generator=self.rng)
 
             self.specimen.append(network)
 
@@ -115,13 +151,82 @@ class NEAT:
         # Go on to the next specimen.
         self.next_specimen()
 
+    # Evaluate the whole generation with fitness_function(network) -> float on a pool of worker processes,
+    # then breed the next generation. Uses all CPU cores if workers is not given.
+    # The fitness function has to be picklable, so it should be defined at module level.
+    def evaluate_generation(self, fitness_function, workers: int = None) -> dict:
+        self.log(f"Evaluating generation {self.generation}...")
+
+        # Put the genomes of all networks back to back.
+        specimen_genomes = []
+        offset = 0
+
+        for network in self.specimen:
+            specimen_genomes.append((offset, network.hidden_layer_count, network.network_structure))
+            offset += network.genome.shape[0]
+
+        genomes = np.concatenate([network.genome for network in self.specimen])
+        self.specimen_fitness = parallel.evaluate_genomes(genomes, specimen_genomes, self.activation_function, fitness_function, workers)
+        fitness = self.specimen_fitness
+        self.finish_generation()
+
+        return fitness
+
+    # Play one episode per specimen in a vectorised environment with population_size instances,
+    # then breed the next generation. The rewards of every specimen are added up as its fitness.
+    # Specimens stop when their episode is over or after their step budget, which is max_steps by default.
+    def evaluate_episodes(self, environment, max_steps: int = 1000, step_budgets=None, action_function=episodes.argmax_actions) -> dict:
+        self.log(f"Playing episodes of generation {self.generation}...")
+
+        # Networks with the same structure are stacked, so each structure takes one forward pass per step.
+        structure_groups = {}
+        for specimen_id, network in enumerate(self.specimen):
+            structure_groups.setdefault(tuple(network.network_structure), []).append(specimen_id)
+
+        # Keep track of the group of every specimen, and where it is in the genomes of that group.
+        groups = []
+        group_of_specimen = np.empty(self.population_size, dtype=np.intp)
+        position_in_group = np.empty(self.population_size, dtype=np.intp)
+
+        for network_structure, specimen_ids in structure_groups.items():
+            group_of_specimen[specimen_ids] = len(groups)
+            position_in_group[specimen_ids] = np.arange(len(specimen_ids))
+            groups.append((GenomeLayout(network_structure), np.stack([self.specimen[specimen_id].genome for specimen_id in specimen_ids])))
+
+        def predict(specimen_ids, observations):
+            outputs = np.empty((specimen_ids.shape[0], self.output_size))
+
+            for group_index in np.unique(group_of_specimen[specimen_ids]):
+                layout, genomes = groups[group_index]
+                rows = group_of_specimen[specimen_ids] == group_index
+
+                outputs[rows] = layout.feed_forward(genomes[position_in_group[specimen_ids[rows]]], observations[rows], self.activation_function)
+
+            return outputs
+
+        rewards = episodes.run_episodes(predict, environment, self.population_size, max_steps, step_budgets, action_function)
+
+        self.specimen_fitness = dict(enumerate(rewards.tolist()))
+        fitness = self.specimen_fitness
+        self.finish_generation()
+
+        return fitness
+
+    # Breed the next generation once every specimen has been scored.
+    def finish_generation(self):
+        # Act as if the last specimen was just trained, so the next generation is bred.
+        self.current_specimen = self.population_size - 1
+        self.next_specimen()
+
     # A helper function to shift to the next specimen.
     def next_specimen(self):
+        self.update_pipeline()
+
         # Check if the entire generation has been ran.
         # If it has been, breed the networks to generate a new generation.
         if self.current_specimen >= self.population_size - 1:
             # Store the sum of fitness as a generation fitness score.
-            self.previous_generation_score = sum(self.specimen_fitness.values())
+            self.previous_generation_score = float(sum(self.specimen_fitness.values()))
 
             # Make a new generation.
             self.breed()
@@ -140,29 +245,22 @@ class NEAT:
         specimen_sorted = sorted(self.specimen_fitness.keys(), key=lambda x: self.specimen_fitness[x], reverse=True)
 
         # Store the score of the best nnetwork of the previous generation.
-        self.best_of_previous = self.specimen_fitness[specimen_sorted[0]]
+        self.best_of_previous = float(self.specimen_fitness[specimen_sorted[0]])
 
         # The best of the generation is copied over without crossover or mutation.
         # Make a list of the new generation.
         best_network = self.specimen[specimen_sorted[0]]
-        new_generation = [best_network]
 
-        # Start generating population_size children based on the previous generation
-        for _ in range(self.population_size - 1):
-            parent1 = self.specimen[self.choose_parent()]
-            parent2 = self.specimen[self.choose_parent()]
+        # Take the children that were bred in the background, or breed them from the whole generation now.
+        children = None
+        if self.breeding_pipeline is not None:
+            children = self.breeding_pipeline.collect()
 
-            # Make a child based on the parents.
-            child = self.breeding_function(self, parent1, parent2)
-
-            # Mutate the child.
-            child = self.mutation_func(child)
-
-            # Add it to the specimen list.
-            new_generation.append(child)
+        if children is None:
+            children = self.breed_children(*self.scored_specimen())
 
         # Set the specimen list.
-        self.specimen = new_generation
+        self.specimen = [best_network] + children
 
         # Add 1 to the generation counter.
         self.generation += 1
@@ -172,103 +270,204 @@ class NEAT:
 
         self.log("Breeding finished.")
 
+    # The ids of the specimens that have a score, and their scores.
+    def scored_specimen(self) -> tuple:
+        scored = np.fromiter(self.specimen_fitness.keys(), dtype=np.intp, count=len(self.specimen_fitness))
+        fitness = np.fromiter(self.specimen_fitness.values(), dtype=np.float64, count=len(self.specimen_fitness))
+
+        return scored, fitness
+
+    # Make the population_size - 1 mutated children of a new generation, with parents chosen among the scored specimens.
+    def breed_children(self, scored: np.ndarray, fitness: np.ndarray) -> list:
+        parents1, parents2 = self.choose_parent_pairs(self.population_size - 1, scored, fitness)
+
+        children = []
+        for parent_id1, parent_id2 in zip(parents1.tolist(), parents2.tolist()):
+            parent1 = self.specimen[parent_id1]
+            parent2 = self.specimen[parent_id2]
+
+            # Make a child based on the parents.
+            child = self.breeding_function(self, parent1, parent2)
+
+            # Mutate the child.
+            child = self.mutation_func(child)
+
+            children.append(child)
+
+        return children
+
+    # Start breeding the next generation in the background once enough of this one has been scored.
+    # The specimen list is not changed until breed() takes the children, so the tail can still be evaluated.
+    def update_pipeline(self):
+        if self.breeding_pipeline is None or not self.breeding_pipeline.ready(len(self.specimen_fitness), self.population_size):
+            return
+
+        scored, fitness = self.scored_specimen()
+        self.log(f"Breeding generation {self.generation + 1} in the background from {scored.shape[0]} scored specimens...", level=logging.DEBUG)
+
+        self.breeding_pipeline.start(lambda: self.breed_children(scored, fitness))
+
     # A function to choose a parent.
     def choose_parent(self):
-        # Generate a random choosing point.
-        fitness_sum = math.floor(sum(self.specimen_fitness.values()))
-        passing_point = rng.randint(0, fitness_sum)
+        return int(self.choose_parents(1)[0])
 
-        # Keep track of a running sum
-        running_sum = 0
+    # A function to choose many parents at once with the selection function.
+    # The parents are chosen among the specimens that have a score, the scored_specimen() of now unless given.
+    def choose_parents(self, count: int, scored: np.ndarray = None, fitness: np.ndarray = None) -> np.ndarray:
+        if scored is None:
+            scored, fitness = self.scored_specimen()
 
-        for specimen_id in range(len(self.specimen)):
-            # Add the current fitness to the running sum.
-            running_sum += self.specimen_fitness[specimen_id]
+        return scored[self.selection_function(self, fitness, count)]
 
-            # Check if the running sum passed the passing point.
-            # If it has, return the specimen id that passed.
-            if running_sum > passing_point:
-                self.log(f"Parent {specimen_id} has been chosen with fitness {self.specimen_fitness[specimen_id]}", level=logging.DEBUG)
-                return specimen_id
+    # Choose the parents of pair_count children in one go.
+    def choose_parent_pairs(self, pair_count: int, scored: np.ndarray = None, fitness: np.ndarray = None) -> tuple:
+        parents = self.choose_parents(2 * pair_count, scored, fitness)
+
+        return parents[:pair_count], parents[pair_count:]
 
     # A function to apply random mutation to networks to provide the genetic variation.
     def mutate(self, network):
         self.log("Starting mutation...", level=logging.DEBUG)
 
         # Only mutate if the chance is met.
-        if rng.random_number() <= self.mutation_chance:
+        if self.rng.random_number() <= self.mutation_chance:
 
             # Mutate self.mutation_severity times
             for _ in range(self.mutation_severity):
-                # Get the neuron that is going to be mutated.
-                mutation_layer = rng.randint(0, len(network.layers) - 1)
-                mutation_neuron = rng.randint(0, len(network.layers[mutation_layer]) - 1)
+                # Get the neuron that is going to be mutated. Hidden layers can be empty.
+                mutation_layer = self.rng.randint(0, len(network.layers) - 1)
+                if len(network.layers[mutation_layer]) <= 0:
+                    continue
+
+                mutation_neuron = self.rng.randint(0, len(network.layers[mutation_layer]) - 1)
 
                 # Mutate the bias or mutate the weight?
-                mutate_bias = rng.randint(0, 1) == 1
+                mutate_bias = self.rng.randint(0, 1) == 1
 
                 if mutate_bias:
                     # Mutate the bias to a new random value between -1 and 1.
-                    network.layers[mutation_layer][mutation_neuron].bias = rng.random_number() * 2 - 1
+                    network.layers[mutation_layer][mutation_neuron].bias = self.rng.random_number() * 2 - 1
                 else:
                     # Cannot mutate a connection that doesn't exist (for example a neuron in the output layer). Perform that check first.
                     if len(network.layers[mutation_layer][mutation_neuron].connections) <= 0:
                         continue
 
-                    mutation_connection = rng.randint(0, len(network.layers[mutation_layer][mutation_neuron].connections) - 1)
+                    mutation_connection = self.rng.randint(0, len(network.layers[mutation_layer][mutation_neuron].connections) - 1)
 
                     # Add the mutation to the current value, to make a small change.
                     # Have a maximum value of 1 and a minimum of -1.
                     current_weight = network.layers[mutation_layer][mutation_neuron].connections[mutation_connection][1]
-                    weight_delta = max(-1, min(current_weight + rng.random_gaussian() / 5, 1))
-                    network.layers[mutation_layer][mutation_neuron].connections[mutation_connection][1] += weight_delta
+                    network.layers[mutation_layer][mutation_neuron].connections[mutation_connection][1] = max(-1, min(current_weight + self.rng.random_gaussian() / 5, 1))
 
         return network
 
     # A function to apply mutation randomly to networks to provide the genetic variation.
+    # The structure can change as well, so the mutated network is returned.
     def mutate_all(self, network):
         self.log("Starting mutation...", level=logging.DEBUG)
 
-        # Mutate the nnetwork parameters.
-        for parameter_id in range(len(network.structure)):
-            if rng.random_number() <= self.mutation_chance:
-                current_parameter = network.structure[parameter_id]
-                new_parameter = current_parameter + round(rng.random_gaussian())
+        # Mutate the nnetwork structure.
+        network = self.mutate_structure(network)
 
-                network.structure[parameter_id] = new_parameter
+        # Only mutate the weights and biases where the chance is met.
+        mutation_mask = self.rng.random_array(network.genome.shape) <= self.mutation_chance
 
-        # Mutate the weights and biases.
-        for layer_index in range(len(network.layers)):
-            for neuron_index in range(len(network.layers[layer_index])):
-                # Only mutate bias if chance is met.
-                if rng.random_number() <= self.mutation_chance:
-                    # Get the current bias.
-                    current_bias = network.layers[layer_index][neuron_index].bias
+        # Add a random Gaussian variable to them, with a max of 1 and a min of -1.
+        current_values = network.genome[mutation_mask]
+        network.genome[mutation_mask] = np.clip(current_values + self.rng.random_gaussian_array(current_values.shape) / 5, -1, 1)
 
-                    # Add a random Gaussian variable to that.
-                    new_bias = current_bias + rng.random_gaussian() / 5
+        return network
 
-                    # Set the new bias (with a max of 1 and a min of -1)
-                    network.layers[layer_index][neuron_index].bias = max(-1, min(1, current_bias + new_bias))
+    # Mutate the amount of hidden layers, and the amount of neurons in every hidden layer, each if the chance is met.
+    # If the structure changes, a new network is returned with the genes of the old one where they still fit.
+    def mutate_structure(self, network):
+        hidden_layers = network.network_structure[1:-1]
 
-                # Go through the connections to mutate them.
-                for connection_index in range(len(network.layers[layer_index][neuron_index].connections)):
-                    # Only mutate if chance is met.
-                    if rng.random_number() <= self.mutation_chance:
-                        # Get the current weight.
-                        current_weight = network.layers[layer_index][neuron_index].connections[connection_index][1]
+        if self.rng.random_number() <= self.mutation_chance:
+            hidden_layer_count = max(0, len(hidden_layers) + round(self.rng.random_gaussian()))
 
-                        # Add a random Gaussian variable to that.
-                        new_weight = current_weight + rng.random_gaussian() / 5
+            # New layers get a random amount of neurons, like the layers of the first generation.
+            while len(hidden_layers) < hidden_layer_count:
+                hidden_layers.append(round(max(0, self.rng.random_gaussian(mean=5, std_deviation=5))))
 
-                        # Set the new weight (with a max of 1 and a min of -1).
-                        network.layers[layer_index][neuron_index].connections[connection_index][1] = max(-1, min(1, new_weight))
+            hidden_layers = hidden_layers[:hidden_layer_count]
 
-        return network
+        for layer_index in range(len(hidden_layers)):
+            if self.rng.random_number() <= self.mutation_chance:
+                hidden_layers[layer_index] = max(0, hidden_layers[layer_index] + round(self.rng.random_gaussian()))
+
+        network_structure = [self.input_size] + hidden_layers + [self.output_size]
+        if network_structure == network.network_structure:
+            return network
+
+        mutated_network = Network(len(hidden_layers), network_structure, activation_function=self.activation_function, random_generator=self.rng)
+        network.layout.copy_genes(network.genome, mutated_network.layout, mutated_network.genome)
+
+        return mutated_network
+
+    # Save the population, the scores and the random state to a checkpoint file, see nnetwork.util.checkpoint.
+    # The genomes of all networks are stored back to back, with the offset and structure of every network in the header.
+    def save_network(self, filename: str = "neat.checkpoint"):
+        # Breeding in the background changes the random state, so it is stopped first. It starts again when it is needed.
+        if self.breeding_pipeline is not None:
+            self.breeding_pipeline.cancel()
+
+        specimen_genomes = []
+        offset = 0
+
+        for network in self.specimen:
+            specimen_genomes.append([offset, network.hidden_layer_count, network.network_structure])
+            offset += network.genome.shape[0]
+
+        header = {
+            "class": type(self).__name__,
+            "attributes": {name: getattr(self, name) for name in self.checkpoint_attributes},
+            "rng": self.rng.get_state(),
+            "specimen_genomes": specimen_genomes,
+        }
+
+        arrays = {
+            "genomes": np.concatenate([network.genome for network in self.specimen]),
+            "scored": np.fromiter(self.specimen_fitness.keys(), dtype=np.intp, count=len(self.specimen_fitness)),
+            "fitness": np.fromiter(self.specimen_fitness.values(), dtype=np.float64, count=len(self.specimen_fitness)),
+        }
+
+        checkpoint.save(filename, header, arrays)
+
+    # Load a checkpoint made by save_network(). The networks are views on the memory mapped genomes.
+    @classmethod
+    def load_network(cls, filename: str = "neat.checkpoint", console_log_level=logging.INFO, file_log_level=None):
+        header, arrays = checkpoint.load(filename)
+
+        neat = cls.__new__(cls)
+        neat.setup_logger(console_log_level, file_log_level)
+        neat.__dict__.update(header["attributes"])
+
+        neat.rng = rng.RNG()
+        neat.rng.set_state(header["rng"])
+        neat.choose_functions()
+
+        neat.breeding_pipeline = None
+        if neat.pipeline_threshold is not None:
+            neat.breeding_pipeline = pipeline.BreedingPipeline(neat.pipeline_threshold)
+
+        # Networks with the same structure share a layout.
+        layouts = {}
+        neat.specimen = []
+
+        for offset, hidden_layer_count, network_structure in header["specimen_genomes"]:
+            layout_key = tuple(network_structure)
+            if layout_key not in layouts:
+                layouts[layout_key] = GenomeLayout(network_structure)
+            layout = layouts[layout_key]
+
+            genome = arrays["genomes"][offset:offset + layout.genome_length]
+            network = Network(hidden_layer_count, network_structure, activation_function=neat.activation_function, genome=genome, layout=layout)
+
+            neat.specimen.append(network)
+
+        neat.specimen_fitness = dict(zip(arrays["scored"].tolist(), arrays["fitness"].tolist()))
+
+        neat.log(f"Loaded generation {neat.generation} from {filename}.")
 
-    # Save the nnetwork to a file.
-    def save_network(self, filename: str = "neat.pickle"):
-        # Open the file.
-        with open(filename, "wb") as fp:
-            # Store it as pickle object.
-            pickle.dump(self, fp)
+        return neat
@@ -1,144 +1,225 @@
 import pickle
 
+import numpy as np
+
+from nnetwork.classes.genome import GenomeLayout
+from nnetwork.classes.genome import compute_dtype
 from nnetwork.util.neuralnet import activation
 from nnetwork.util import rng
 
 
+class Connection:
+    # A connection is a view on a single weight in the genome of a network.
+    # It behaves like the (node: Neuron, weight: float) pair it used to be.
+    # There can be a lot of them, so they have no __dict__.
+    __slots__ = ("network", "layer_index", "neuron_index", "connection_index")
+
+    def __init__(self, network, layer_index: int, neuron_index: int, connection_index: int):
+        self.network = network
+        self.layer_index = layer_index
+        self.neuron_index = neuron_index
+        self.connection_index = connection_index
+
+    def __getitem__(self, index: int):
+        if index == 0:
+            return self.network.layers[self.layer_index + 1][self.connection_index]
+        elif index == 1:
+            return float(self.network.weight_matrices[self.layer_index][self.neuron_index, self.connection_index])
+
+        raise IndexError("A connection only has a neuron and a weight.")
+
+    def __setitem__(self, index: int, value: float):
+        if index != 1:
+            raise IndexError("Only the weight of a connection can be changed.")
+
+        self.network.weight_matrices[self.layer_index][self.neuron_index, self.connection_index] = value
+
+    def __iter__(self):
+        yield self[0]
+        yield self[1]
+
+    def __len__(self):
+        return 2
+
+
 class Neuron:
-    def __init__(self, bias: float = None, activation_function: str = "sigmoid"):
-        # Keep track of connections to other neurons and their weights.
-        # Structure should be (node: Neuron, weight: float).
-        self.connections = []
-
-        # Keep track of the inputs (* weights) of other neurons.
-        self.inputs = []
-        self.value = 0.0
-
-        # Keep track of nnetwork settings.
-        self.activation_function = activation.activation_functions[activation_function]
-
-        # Set the bias of the neuron.
-        if bias is None:
-            # It's between -1 and 1.
-            self.bias = rng.random_number() * 2 - 1
-        else:
-            self.bias = bias
-
-    # Return the value if requested.
+    # A neuron is a view on a bias and the outgoing weights in the genome of a network.
+    __slots__ = ("network", "layer_index", "neuron_index", "_connections")
+
+    def __init__(self, network, layer_index: int, neuron_index: int):
+        self.network = network
+        self.layer_index = layer_index
+        self.neuron_index = neuron_index
+
+        # The connection views are only made when they are asked for.
+        self._connections = None
+
+    @property
+    def bias(self) -> float:
+        return float(self.network.bias_vectors[self.layer_index][self.neuron_index])
+
+    @bias.setter
+    def bias(self, value: float):
+        self.network.bias_vectors[self.layer_index][self.neuron_index] = value
+
+    # Keep track of connections to neurons in the next layer and their weights.
+    @property
+    def connections(self) -> list:
+        if self._connections is None:
+            # The output layer has no connections.
+            if self.layer_index >= len(self.network.weight_matrices):
+                self._connections = []
+            else:
+                self._connections = [Connection(self.network, self.layer_index, self.neuron_index, connection_index) for connection_index in range(self.network.network_structure[self.layer_index + 1])]
+
+        return self._connections
+
+    # Return the value of the last prediction if requested.
+    @property
+    def value(self) -> float:
+        if not self.network.values:
+            return 0.0
+
+        return float(self.network.values[self.layer_index][self.neuron_index])
+
     def get_value(self) -> float:
         return self.value
 
-    # Set the value when requested.
-    def set_value(self, value: float):
-        self.value = value
 
-    # Add to the current input list.
-    def add_input(self, value: float):
-        self.inputs.append(value)
+class Network:
+    def __init__(self, hidden_layer_count: int, network_structure: list, activation_function: str = "sigmoid", genome: np.ndarray = None, layout: GenomeLayout = None, random_generator: rng.RNG = None, dtype="float64"):
+        # Store the general nnetwork structure.
+        self.hidden_layer_count = hidden_layer_count
+        self.network_structure = list(network_structure[:hidden_layer_count + 2])  # The (+ 2) is for the input and output layer.
+        self.activation_function = activation_function
 
-    # Add a function to clear neuron inputs.
-    def clear_inputs(self):
-        self.inputs = []
+        # The layout tells where every weight and bias lives in the genome.
+        # Networks with the same structure can share one layout.
+        if layout is None:
+            layout = GenomeLayout(self.network_structure)
+        self.layout = layout
 
-    # Feed forward the data.
-    def feed_forward(self):
-        # Run the activation function before feed-forward.
-        # But only if it's not an input neuron. Then the value is already set.
-        self.value = self.activation_function(self.inputs)
+        # Initialise the weights and biases randomly if no genome is given.
+        # They are between -1 and 1, and stored as dtype. A given genome keeps its own type.
+        if genome is None:
+            if random_generator is None:
+                random_generator = rng.DEFAULT_RNG
 
-        # Only feed-forward if the bias has been met.
-        if self.value > self.bias:
-            # Set the values of the neurons in the next layer.
-            for connection in self.connections:
-                next_neuron, weight = connection
+            genome = (random_generator.random_array(self.layout.genome_length) * 2 - 1).astype(dtype)
 
-                next_neuron.inputs.append(self.value * weight)
+        self.set_genome(genome)
 
-    # Create connection between other neurons.
-    def connect(self, neuron_connector, weight=None):
-        # Initialise weight if it's not specified.
-        if weight is None:
-            # Weight is between -1 and 1
-            weight = rng.random_number() * 2 - 1
+    # Make a network from weights and biases like get_weights_and_biases() returns them, without drawing random ones first.
+    # weights holds a (neurons, neurons in the next layer) matrix per layer, as nested lists or an array.
+    # The empty weights of the output layer can be left out.
+    @classmethod
+    def from_weights(cls, network_structure: list, weights: list, biases: list, activation_function: str = "sigmoid", dtype="float64"):
+        layout = GenomeLayout(network_structure)
 
-        # Add the actual connection.
-        self.connections.append([neuron_connector, weight])
+        if len(biases) != len(network_structure) or len(weights) < len(network_structure) - 1:
+            raise ValueError(f"Expected biases for {len(network_structure)} layers and weights for {len(network_structure) - 1}, got {len(biases)} and {len(weights)}.")
 
+        genome = np.empty(layout.genome_length, dtype=dtype)
 
-class Network:
-    def __init__(self, hidden_layer_count: int, network_structure: list, activation_function: str = "sigmoid"):
-        # Make the general nnetwork structure.
-        self.layers: list = []
-        self.make_layers(hidden_layer_count, network_structure, activation_function)
-        self.connect_neurons()
-
-    def make_layers(self, hidden_layer_count: int, network_structure: list, activation_function: str):
-        for layer_index in range(hidden_layer_count + 2):  # The (+ 2) is for the input and output layer.
-            # Create an intermediary list to keep neurons in.
-            layer = []
-
-            # Get the amount of neurons that need to be created for this layer.
-            neuron_count = network_structure[layer_index]
-
-            for neuron_index in range(neuron_count):
-                # Add a neuron with random biases to the list.
-                layer.append(Neuron(activation_function=activation_function))
-
-            # Add the layer to the central layers list.
-            self.layers.append(layer)
-
-    def connect_neurons(self):
-        # We connect the neurons from the output layer back.
-        # So the range goes from len(self.layers) - 1 to 0.
-        for layer_index in range(len(self.layers) - 1, 0, -1):
-            # The connection is made from the layer before layer_index to the one at layer_index.
-            for neuron in self.layers[layer_index - 1]:
-                for last_layer_neuron in self.layers[layer_index]:
-                    neuron.connect(last_layer_neuron)
+        for layer_index, bias_vector in enumerate(layout.bias_vectors(genome)):
+            bias_vector[:] = biases[layer_index]
 
-    def make_prediction(self, input_values: list) -> list:
-        # First reset all neuron values.
-        for layer in self.layers:
-            for neuron in layer:
-                neuron.clear_inputs()
+        for layer_index, weight_matrix in enumerate(layout.weight_matrices(genome)):
+            weight_matrix[:] = weights[layer_index]
+
+        return cls(len(network_structure) - 2, network_structure, activation_function=activation_function, genome=genome, layout=layout)
+
+    # Point the network at a genome. The genome can be a row of a larger population array,
+    # in which case the network is a view on that row.
+    def set_genome(self, genome: np.ndarray):
+        if genome.shape != (self.layout.genome_length,):
+            raise ValueError(f"Expected a genome of length {self.layout.genome_length}, got shape {genome.shape}.")
+
+        self.genome = genome
+
+        # The type the values are computed in. Float16 genomes are computed in float32.
+        self.compute_dtype = compute_dtype(genome.dtype)
+
+        # Per-layer weight matrices and bias vectors, as views on the genome.
+        # The matrix of layer i has shape (neurons in layer i, neurons in layer i + 1).
+        self.weight_matrices = self.layout.weight_matrices(genome)
+        self.bias_vectors = self.layout.bias_vectors(genome)
+
+        # The neuron views are only made when they are asked for.
+        self._layers = None
+
+        # The values of every layer after the last single prediction.
+        self.values = []
+
+    # Get the layers of neurons. The neurons are views on the genome.
+    @property
+    def layers(self) -> list:
+        if self._layers is None:
+            self._layers = [[Neuron(self, layer_index, neuron_index) for neuron_index in range(neuron_count)] for layer_index, neuron_count in enumerate(self.network_structure)]
+
+        return self._layers
 
-        # Set the values of the input neurons (first layer).
-        for neuron_index in range(len(self.layers[0])):
-            self.layers[0][neuron_index].add_input(input_values[neuron_index])
+    # The weight matrices and bias vectors are views on the genome, so they are always up to date.
+    # This is kept so code that compiles networks keeps working.
+    def compile(self):
+        return self
 
-        # Feed forward the data
-        for layer in self.layers:
-            for neuron in layer:
-                neuron.feed_forward()
+    # Feed forward using the weight matrices.
+    # Works on a single input vector as well as on an (N, input_size) batch.
+    def feed_forward(self, input_values: np.ndarray, keep_values: bool = False) -> np.ndarray:
+        activation_function = activation.array_activation_functions[self.activation_function]
 
-        # The answer is now in the last layer, so get those values.
-        values = [neuron.get_value() for neuron in self.layers[-1]]
+        # The input neurons also run their input through the activation function.
+        values = activation_function(np.asarray(input_values, dtype=self.compute_dtype))
+        layer_values = [values]
+
+        for layer_index in range(len(self.weight_matrices)):
+            # A neuron only feeds forward if its value is above its bias.
+            gated_values = np.where(values > self.bias_vectors[layer_index], values, 0)
+
+            values = activation_function(gated_values @ self.weight_matrices[layer_index].astype(self.compute_dtype, copy=False))
+            layer_values.append(values)
+
+        if keep_values:
+            self.values = layer_values
 
         return values
 
+    def make_prediction(self, input_values: list) -> list:
+        # The answer is in the last layer.
+        return self.feed_forward(np.asarray(input_values, dtype=np.float64), keep_values=True).tolist()
+
+    # Make predictions for a batch of inputs at once.
+    # Takes an (N, input_size) array and returns an (N, output_size) array.
+    def make_prediction_batch(self, inputs) -> np.ndarray:
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if inputs.ndim != 2 or inputs.shape[1] != self.network_structure[0]:
+            raise ValueError(f"Expected inputs of shape (N, {self.network_structure[0]}), got {inputs.shape}.")
+
+        return self.feed_forward(inputs)
+
     # Function to retrieve weights and biases.
     def get_weights_and_biases(self) -> tuple:
-        # Make a list of biases and weights.
-        weights = []
-        biases = []
+        # The neurons in the output layer have no connections.
+        weights = [weight_matrix.tolist() for weight_matrix in self.weight_matrices]
+        weights.append([[] for _ in range(self.network_structure[-1])])
 
-        # Get the actual weights and biases.
-        for layer in self.layers:
-            layer_weights = []
-            layer_biases = []
+        biases = [bias_vector.tolist() for bias_vector in self.bias_vectors]
 
-            for neuron in layer:
-                connection_weights = []
-                layer_biases.append(neuron.bias)
+        return weights, biases
 
-                for connection in neuron.connections:
-                    connection_weights.append(connection[1])
-                layer_weights.append(connection_weights)
+    # Only the genome has to be pickled, the views are made again when loading.
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
 
-            weights.append(layer_weights)
-            biases.append(layer_biases)
+        for key in ("weight_matrices", "bias_vectors", "compute_dtype", "_layers", "values"):
+            del state[key]
 
-        return weights, biases
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.set_genome(self.genome)
 
     # Save the nnetwork to a file.
     def save_network(self, filename: str = "nnetwork.pickle"):
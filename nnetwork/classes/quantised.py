@@ -0,0 +1,174 @@
+import numpy as np
+
+from nnetwork.classes.genome import GenomeLayout
+from nnetwork.classes.neuralnet import Network
+from nnetwork.util import checkpoint
+from nnetwork.util import episodes
+from nnetwork.util.neuralnet import activation
+
+
+# The largest int8 value that is used. -128 is left out, so the range is symmetric around 0.
+INT8_MAX = 127
+
+# The activation functions that only give values between -1 and 1, so their values can be scaled without calibration.
+BOUNDED_ACTIVATIONS = ("binary", "hard_sigmoid", "hard_tanh", "sigmoid", "tanh")
+
+# Float32 holds every integer up to 2 ** 24 exactly. While the sums of a layer stay below that,
+# the integer matrix multiplication is done in float32, which NumPy does much faster than in int32.
+EXACT_FLOAT32_LIMIT = 2 ** 24
+
+
+# Round values to int8, with value = int8 value * scale.
+def quantise(values: np.ndarray, scale: float) -> np.ndarray:
+    return np.clip(np.rint(values / scale), -INT8_MAX, INT8_MAX).astype(np.int8)
+
+
+# An int8 copy of a Network, for cheap inference of a champion, for example one from the hall of fame.
+# The genome has the same layout as the genome of a Network, with int8 values:
+#   - the weights of a layer are stored as int8 weight * weight scale,
+#   - the biases are replaced by gate thresholds: a neuron feeds forward if its int8 value is above its threshold.
+# The values of a layer are rounded to int8 with the value scale of the layer, gated and summed as integers.
+# The sums are scaled back and run through the activation function, so the outputs are floats like those of a Network.
+class QuantisedNetwork:
+    def __init__(self, network_structure: list, activation_function: str, genome: np.ndarray, weight_scales: list, value_scales: list):
+        self.network_structure = list(network_structure)
+        self.activation_function = activation_function
+
+        self.layout = GenomeLayout(self.network_structure)
+        if genome.shape != (self.layout.genome_length,):
+            raise ValueError(f"Expected a genome of length {self.layout.genome_length}, got shape {genome.shape}.")
+
+        self.genome = np.asarray(genome, dtype=np.int8)
+        self.weight_scales = [float(weight_scale) for weight_scale in weight_scales]
+        self.value_scales = [float(value_scale) for value_scale in value_scales]
+
+        # Views on the genome, like the weight matrices and bias vectors of a Network.
+        self.weight_matrices = self.layout.weight_matrices(self.genome)
+        self.gate_thresholds = self.layout.bias_vectors(self.genome)
+
+        # The weights in the type the integer sums are done in, and the scale that turns a sum back into a float.
+        # The int8 values are whole numbers, so they are exact in float32 as well.
+        self.sum_matrices = []
+        self.sum_scales = []
+        for layer_index, weight_matrix in enumerate(self.weight_matrices):
+            if self.network_structure[layer_index] * INT8_MAX * INT8_MAX < EXACT_FLOAT32_LIMIT:
+                self.sum_matrices.append(weight_matrix.astype(np.float32))
+            else:
+                self.sum_matrices.append(weight_matrix.astype(np.int32))
+
+            self.sum_scales.append(np.float32(self.value_scales[layer_index] * self.weight_scales[layer_index]))
+
+        self.inverse_value_scales = [np.float32(1 / value_scale) for value_scale in self.value_scales]
+
+    # Quantise a network. The values of every layer are scaled to fit int8.
+    # Activation functions between -1 and 1 need nothing else. For the others, like relu, the range of the values
+    # is measured on calibration_inputs, an (N, input_size) array of inputs like the ones the network will get.
+    @classmethod
+    def from_network(cls, network: Network, calibration_inputs=None):
+        layer_count = len(network.network_structure)
+
+        if calibration_inputs is not None:
+            # Run the inputs through the float network, without changing the values it keeps for its neurons.
+            previous_values = network.values
+            network.feed_forward(np.asarray(calibration_inputs, dtype=np.float64), keep_values=True)
+            layer_values, network.values = network.values, previous_values
+
+            value_scales = [max(float(np.abs(values).max()), np.finfo(np.float32).tiny) / INT8_MAX for values in layer_values]
+        elif network.activation_function in BOUNDED_ACTIVATIONS:
+            value_scales = [1 / INT8_MAX] * layer_count
+        else:
+            raise ValueError(f"The values of {network.activation_function} are not bounded, calibration inputs are needed to quantise it.")
+
+        genome = np.zeros(network.layout.genome_length, dtype=np.int8)
+        weight_scales = []
+
+        for layer_index, weight_matrix in enumerate(network.weight_matrices):
+            # An empty layer keeps a scale of 1, so nothing is divided by 0.
+            weight_scale = float(np.abs(weight_matrix).max()) / INT8_MAX or 1.0
+            weight_scales.append(weight_scale)
+
+            network.layout.weight_matrix(genome, layer_index)[:] = quantise(weight_matrix, weight_scale)
+
+        for layer_index, bias_vector in enumerate(network.bias_vectors):
+            # The int8 value is a whole number, so it is above bias / value scale if it is above the floor of that.
+            # A threshold of 127 lets nothing through and one of -128 lets everything through, so clipping keeps the gate.
+            thresholds = np.floor(np.asarray(bias_vector, dtype=np.float64) / value_scales[layer_index])
+            network.layout.bias_vector(genome, layer_index)[:] = np.clip(thresholds, -INT8_MAX - 1, INT8_MAX)
+
+        return cls(network.network_structure, network.activation_function, genome, weight_scales, value_scales)
+
+    # Feed forward a single input vector or an (N, input_size) batch. Returns float32 outputs.
+    def feed_forward(self, input_values) -> np.ndarray:
+        activation_function = activation.array_activation_functions[self.activation_function]
+
+        # The input neurons also run their input through the activation function.
+        values = activation_function(np.asarray(input_values, dtype=np.float32))
+
+        for layer_index in range(len(self.sum_matrices)):
+            # Round the values to int8. They are kept as whole numbers in float32, which saves converting them.
+            quantised_values = np.rint(values * self.inverse_value_scales[layer_index])
+            np.clip(quantised_values, -INT8_MAX, INT8_MAX, out=quantised_values)
+
+            # A neuron only feeds forward if its value is above its bias.
+            gated_values = np.where(quantised_values > self.gate_thresholds[layer_index], quantised_values, 0)
+
+            sums = gated_values.astype(self.sum_matrices[layer_index].dtype, copy=False) @ self.sum_matrices[layer_index]
+            values = activation_function((sums * self.sum_scales[layer_index]).astype(np.float32, copy=False))
+
+        return values
+
+    def make_prediction(self, input_values: list) -> list:
+        return self.feed_forward(input_values).tolist()
+
+    # Make predictions for a batch of inputs at once.
+    # Takes an (N, input_size) array and returns an (N, output_size) array.
+    def make_prediction_batch(self, inputs) -> np.ndarray:
+        inputs = np.asarray(inputs, dtype=np.float32)
+        if inputs.ndim != 2 or inputs.shape[1] != self.network_structure[0]:
+            raise ValueError(f"Expected inputs of shape (N, {self.network_structure[0]}), got {inputs.shape}.")
+
+        return self.feed_forward(inputs)
+
+    # The amount of bytes of the model: the int8 genome and a float32 weight and value scale per layer.
+    def nbytes(self) -> int:
+        return self.genome.nbytes + 4 * (len(self.weight_scales) + len(self.value_scales))
+
+    # Save the model to a checkpoint file, see nnetwork.util.checkpoint.
+    def save_network(self, filename: str = "nnetwork.int8"):
+        header = {
+            "network_structure": self.network_structure,
+            "activation_function": self.activation_function,
+            "weight_scales": self.weight_scales,
+            "value_scales": self.value_scales,
+        }
+
+        checkpoint.save(filename, header, {"genome": self.genome})
+
+    @classmethod
+    def load_network(cls, filename: str = "nnetwork.int8"):
+        header, arrays = checkpoint.load(filename)
+
+        return cls(header["network_structure"], header["activation_function"], arrays["genome"], header["weight_scales"], header["value_scales"])
+
+
+# Compare the decisions of a quantised network with those of the float network it was made from, on recorded inputs.
+# inputs is an (N, input_size) array, for example the observations of a few recorded games.
+# action_function turns outputs into decisions, the output with the highest value by default.
+def accuracy_report(network: Network, quantised_network: QuantisedNetwork, inputs, action_function=episodes.argmax_actions) -> dict:
+    inputs = np.asarray(inputs, dtype=np.float64)
+
+    float_outputs = network.make_prediction_batch(inputs)
+    quantised_outputs = quantised_network.make_prediction_batch(inputs)
+
+    agreements = action_function(float_outputs) == action_function(quantised_outputs)
+    errors = np.abs(quantised_outputs - float_outputs)
+
+    return {
+        "inputs": inputs.shape[0],
+        "agreement": float(agreements.mean()) if inputs.shape[0] else 1.0,
+        "disagreements": np.flatnonzero(~agreements).tolist(),
+        "max_output_error": float(errors.max()) if inputs.shape[0] else 0.0,
+        "mean_output_error": float(errors.mean()) if inputs.shape[0] else 0.0,
+        "float_bytes": network.genome.nbytes,
+        "quantised_bytes": quantised_network.nbytes(),
+    }
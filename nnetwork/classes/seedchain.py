@@ -0,0 +1,301 @@
+import collections
+import logging
+
+import numpy as np
+
+from nnetwork.classes.gennetic import GeNNetic
+from nnetwork.classes.genome import GenomeLayout
+from nnetwork.classes.neuralnet import Network
+from nnetwork.util import checkpoint
+from nnetwork.util import episodes
+from nnetwork.util import parallel
+from nnetwork.util import rng
+from nnetwork.util import seedchain
+from nnetwork.util import selection
+
+
+# The amount of specimens that are made and predicted at once by predict_population.
+PREDICTION_CHUNK_SIZE = 256
+
+
+# A list-like view of the networks of a SeedChainGeNNetic. The networks are made when they are asked for.
+class SeedChainSpecimen:
+    def __init__(self, genn_object):
+        self.genn_object = genn_object
+
+    def __len__(self) -> int:
+        return self.genn_object.population_size
+
+    def __getitem__(self, specimen_id: int) -> Network:
+        if not 0 <= specimen_id < len(self):
+            raise IndexError(f"Specimen {specimen_id} does not exist.")
+
+        return self.genn_object.get_network(specimen_id)
+
+
+# A GeNNetic that stores every specimen as a seed chain, see nnetwork.util.seedchain.
+# Genomes are made from their seeds when they are needed, and the last cache_size of them are kept,
+# the whole population by default. The genomes of the parents of the generation are kept as well,
+# so a child only takes one mutation to make, however long its chain is.
+# Children are only mutated, there is no crossover: a child is the chain of its parent with one mutation added.
+# Only generational evolution is supported.
+class SeedChainGeNNetic(GeNNetic):
+    checkpoint_attributes = (
+        "generation", "previous_generation_score", "best_of_previous", "hidden_layer_count", "network_structure",
+        "mutation_chance", "mutation_sigma", "population_size", "current_specimen", "activation_function",
+        "selection_function_name", "tournament_size", "cache_size",
+    )
+
+    def __init__(self, hidden_layer_count: int, network_structure: list, population_size: int = 5000, mutation_chance: float = 0.02, mutation_sigma: float = 0.2, activation_function="tanh", console_log_level=logging.INFO, file_log_level=None, selection_function="roulette", tournament_size: int = 3, seed=None, cache_size: int = None):
+        # Make a logger if requested.
+        self.setup_logger(console_log_level, file_log_level)
+
+        # Make a random generator that is seeded once, so runs can be reproduced and resumed.
+        self.rng = rng.RNG(seed)
+
+        # Keep track of the generation being trained and some scoring of the previous generation.
+        self.generation = 0
+        self.previous_generation_score = 0
+        self.best_of_previous = 0
+
+        # Store the nnetwork structure.
+        self.hidden_layer_count = hidden_layer_count
+        self.network_structure = network_structure
+        self.layout = GenomeLayout(self.network_structure[:self.hidden_layer_count + 2])
+
+        # Store the mutation settings. The default sigma matches the mutation of GeNNetic.
+        self.mutation_chance = mutation_chance
+        self.mutation_sigma = mutation_sigma
+
+        self.population_size = population_size
+        self.current_specimen = 0
+        self.unassigned_specimen = collections.deque(range(self.population_size))
+
+        # The parts of GeNNetic that do not apply to seed chains are switched off.
+        self.evolution_mode = "generational"
+        self.breeding_pipeline = None
+        self.lazy_parents = None
+        self.lineage = None
+
+        self.activation_function = activation_function
+
+        # Choose how parents are selected.
+        self.selection_function_name = selection_function
+        self.tournament_size = tournament_size
+        self.choose_functions()
+
+        # The genomes that were made last, by the bytes of their chain.
+        self.cache_size = self.population_size if cache_size is None else cache_size
+        self.cache = collections.OrderedDict()
+
+        # The genomes of the parents of this generation, by the bytes of their chain.
+        self.parent_genomes = {}
+
+        self.chains = []
+        self.specimen = []
+        self.specimen_fitness = {}
+        self.reset_generation()
+
+        self.log(f"Setting up seed chain population with: Size: {self.population_size}, Mutation: {self.mutation_chance * 100}%, Structure: {repr(self.network_structure)}")
+
+    def choose_functions(self):
+        self.selection_function = selection.selection_functions[self.selection_function_name]
+
+    # This prepares generation 0, which is only a seed per specimen.
+    def reset_generation(self):
+        self.log("Preparing population for first use...")
+
+        self.chains = [seedchain.make_chain(seed) for seed in self.rng.randint_array(0, seedchain.SEED_MAX, self.population_size).tolist()]
+        self.make_specimen()
+
+        self.log("Population generated.")
+
+    def make_specimen(self):
+        self.specimen = SeedChainSpecimen(self)
+
+    # Get the genome of a chain. A child of a known parent only needs its last mutation, anything else is replayed.
+    # The genome is shared with the cache, so it is read-only.
+    def materialise_chain(self, chain: np.ndarray) -> np.ndarray:
+        key = chain.tobytes()
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        genome = seedchain.materialise_from(self.layout, chain, self.parent_genomes)
+        genome.flags.writeable = False
+
+        if self.cache_size:
+            self.cache[key] = genome
+
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return genome
+
+    def genome(self, specimen_id: int) -> np.ndarray:
+        return self.materialise_chain(self.chains[specimen_id])
+
+    # Stack the genomes of many specimens into one (specimens, genome_length) array.
+    def genomes_of(self, specimen_ids) -> np.ndarray:
+        return np.stack([self.genome(specimen_id) for specimen_id in specimen_ids])
+
+    def get_network(self, specimen_id: int) -> Network:
+        return Network(self.hidden_layer_count, self.network_structure, activation_function=self.activation_function, genome=self.genome(specimen_id), layout=self.layout)
+
+    # Make the genome of a specimen ahead of time, for example when it is handed out to an evaluator.
+    def materialise_specimen(self, specimen_id: int):
+        self.genome(specimen_id)
+
+    def predict_population(self, inputs) -> np.ndarray:
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if inputs.ndim == 1:
+            inputs = np.broadcast_to(inputs, (self.population_size, inputs.shape[0]))
+
+        if inputs.shape != (self.population_size, self.network_structure[0]):
+            raise ValueError(f"Expected inputs of shape ({self.network_structure[0]},) or ({self.population_size}, {self.network_structure[0]}), got {inputs.shape}.")
+
+        # Only a chunk of the genomes is stacked at a time, so the whole population is never in memory.
+        outputs = np.empty((self.population_size, self.layout.network_structure[-1]))
+        for start in range(0, self.population_size, PREDICTION_CHUNK_SIZE):
+            end = min(start + PREDICTION_CHUNK_SIZE, self.population_size)
+            outputs[start:end] = self.predict_genomes(self.genomes_of(range(start, end)), inputs[start:end])
+
+        return outputs
+
+    def predict_genomes(self, genomes: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+        return self.layout.feed_forward(genomes, inputs, self.activation_function)
+
+    # Evaluate the whole generation on a pool of worker processes. The workers get the chains and make the genomes themselves.
+    def evaluate_generation(self, fitness_function, workers: int = None) -> dict:
+        self.log(f"Evaluating generation {self.generation}...")
+
+        self.specimen_fitness = parallel.evaluate_chains(self.chains, self.parent_genomes, self.hidden_layer_count, self.layout.network_structure, self.activation_function, fitness_function, workers)
+        fitness = self.specimen_fitness
+        self.finish_generation()
+
+        return fitness
+
+    # Play one episode per specimen in a vectorised environment, see GeNNetic.evaluate_episodes.
+    # The genomes are stacked once for all steps, and let go when the episodes are over.
+    def evaluate_episodes(self, environment, max_steps: int = 1000, step_budgets=None, action_function=episodes.argmax_actions) -> dict:
+        self.log(f"Playing episodes of generation {self.generation}...")
+
+        genomes = self.genomes_of(range(self.population_size))
+
+        def predict(specimen_ids, observations):
+            return self.predict_genomes(genomes[specimen_ids], observations)
+
+        rewards = episodes.run_episodes(predict, environment, self.population_size, max_steps, step_budgets, action_function)
+        del genomes
+
+        self.specimen_fitness = dict(enumerate(rewards.tolist()))
+        fitness = self.specimen_fitness
+        self.finish_generation()
+
+        return fitness
+
+    # Make the next generation: the best chain is kept, every other specimen is a parent's chain with a new mutation.
+    def breed(self):
+        scored, fitness = self.scored_specimen()
+
+        self.log("Starting breeding process...")
+        self.log(f"Generation average: {fitness.mean()}. Best: {fitness.max()}")
+
+        # Store the score of the best nnetwork of the previous generation.
+        best_id = scored[np.argmax(fitness)]
+        self.best_of_previous = float(fitness.max())
+
+        self.end_generation(scored, fitness)
+
+        parents = self.choose_parents(self.population_size - 1, scored, fitness)
+        seeds = self.rng.randint_array(0, seedchain.SEED_MAX, self.population_size - 1)
+
+        new_chains = [self.chains[best_id]]
+        for parent_id, seed in zip(parents.tolist(), seeds.tolist()):
+            new_chains.append(seedchain.extend_chain(self.chains[parent_id], seed, self.mutation_sigma, self.mutation_chance))
+
+        # Keep the genomes of the parents, which are mostly in the cache or one mutation away from the last parents.
+        # The rest of the cache is of this generation, which is not needed anymore.
+        self.parent_genomes = {self.chains[parent_id].tobytes(): self.genome(parent_id) for parent_id in np.unique(np.append(parents, best_id)).tolist()}
+        self.cache.clear()
+
+        self.chains = new_chains
+
+        # Add 1 to the generation counter.
+        self.generation += 1
+
+        # Reset the fitness dictionary and hand out the new generation from the start.
+        self.specimen_fitness = {}
+        self.unassigned_specimen = collections.deque(range(self.population_size))
+
+        self.log("Breeding finished.")
+
+    # The amount of bytes used by the chains of the population.
+    def nbytes(self) -> int:
+        return sum(chain.nbytes for chain in self.chains)
+
+    # The cached genomes are made again when they are needed, so they are not pickled.
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["specimen"]
+        state["cache"] = collections.OrderedDict()
+        state["parent_genomes"] = {}
+
+        return state
+
+    # Save the chains, the scores and the random state to a checkpoint file. The chains are stored back to back.
+    def save_network(self, filename: str = "GeNN.checkpoint"):
+        header = {
+            "class": type(self).__name__,
+            "attributes": {name: getattr(self, name) for name in self.checkpoint_attributes},
+            "rng": self.rng.get_state(),
+        }
+
+        chains = np.concatenate(self.chains)
+        scored, fitness = self.scored_specimen()
+        arrays = {
+            "chain_lengths": np.array([chain.shape[0] for chain in self.chains], dtype=np.int64),
+            "seeds": chains["seed"],
+            "sigmas": chains["sigma"],
+            "chances": chains["chance"],
+            "scored": scored,
+            "fitness": fitness,
+            "unassigned_specimen": np.array(self.unassigned_specimen, dtype=np.intp),
+        }
+
+        checkpoint.save(filename, header, arrays)
+
+    @classmethod
+    def load_network(cls, filename: str = "GeNN.checkpoint", console_log_level=logging.INFO, file_log_level=None):
+        header, arrays = checkpoint.load(filename)
+
+        genn = cls.__new__(cls)
+        genn.setup_logger(console_log_level, file_log_level)
+        genn.__dict__.update(header["attributes"])
+
+        genn.rng = rng.RNG()
+        genn.rng.set_state(header["rng"])
+        genn.choose_functions()
+
+        genn.layout = GenomeLayout(genn.network_structure[:genn.hidden_layer_count + 2])
+        genn.evolution_mode = "generational"
+        genn.breeding_pipeline = None
+        genn.lazy_parents = None
+        genn.lineage = None
+        genn.cache = collections.OrderedDict()
+        genn.parent_genomes = {}
+
+        chains = np.empty(arrays["seeds"].shape[0], dtype=seedchain.CHAIN_DTYPE)
+        chains["seed"] = arrays["seeds"]
+        chains["sigma"] = arrays["sigmas"]
+        chains["chance"] = arrays["chances"]
+        genn.chains = np.split(chains, np.cumsum(arrays["chain_lengths"])[:-1])
+        genn.make_specimen()
+
+        genn.specimen_fitness = dict(zip(arrays["scored"].tolist(), arrays["fitness"].tolist()))
+        genn.unassigned_specimen = collections.deque(arrays["unassigned_specimen"].tolist())
+
+        genn.log(f"Loaded generation {genn.generation} from {filename}.")
+
+        return genn
@@ -0,0 +1,95 @@
+import numpy as np
+
+from nnetwork.classes.genome import GenomeLayout
+from nnetwork.classes.neuralnet import Network
+from nnetwork.classes.quantised import QuantisedNetwork
+from nnetwork.util import records
+
+
+# A hall of fame is an append-only record file, see nnetwork.util.records, with the best genomes
+# and the score statistics of every generation. Every generation has one record.
+ARCHIVE_MAGIC = b"NNHOF\x00"
+
+
+def record_dtype(genome_length: int, champion_count: int) -> np.dtype:
+    return np.dtype([
+        ("generation", "<i8"),
+        ("total", "<f8"),
+        ("mean", "<f8"),
+        ("best", "<f8"),
+        ("champion_fitness", "<f8", (champion_count,)),
+        ("champions", "<f8", (champion_count, genome_length)),
+    ])
+
+
+class HallOfFame(records.RecordFile):
+    # Open the archive, or make it if it does not exist. With truncate, an existing archive is started over.
+    def __init__(self, filename: str, hidden_layer_count: int, network_structure: list, activation_function: str = "sigmoid", champion_count: int = 1, truncate: bool = False):
+        header = {
+            "hidden_layer_count": hidden_layer_count,
+            "network_structure": list(network_structure[:hidden_layer_count + 2]),
+            "activation_function": activation_function,
+            "champion_count": champion_count,
+        }
+
+        genome_length = GenomeLayout(header["network_structure"]).genome_length
+        header["genome_length"] = genome_length
+
+        super().__init__(filename, ARCHIVE_MAGIC, "hall of fame archive", header, record_dtype(genome_length, champion_count), truncate)
+
+    # Add the record of a generation. fitness holds the scores of the whole generation,
+    # champions the genomes of the best specimens with champion_fitness their scores, best first.
+    # With fewer champions than champion_count, the rest of the record is filled with NaN.
+    def append(self, generation: int, fitness: np.ndarray, champions: np.ndarray, champion_fitness: np.ndarray):
+        record = np.zeros(1, dtype=self.dtype)
+        record["generation"] = generation
+        record["total"] = fitness.sum()
+        record["mean"] = fitness.mean()
+        record["best"] = fitness.max()
+
+        record["champion_fitness"] = np.nan
+        record["champions"] = np.nan
+        record["champion_fitness"][0, :champions.shape[0]] = champion_fitness
+        record["champions"][0, :champions.shape[0]] = champions
+
+        record_number = len(self)
+        super().append(record)
+        self.generation_records[generation] = record_number
+
+    # The record number of every generation is read once when the archive is opened, and kept up to date,
+    # so a champion is found without going over the other records.
+    # A generation that was recorded twice, for example after resuming from an older checkpoint, points at its latest record.
+    def truncate(self, length: int):
+        super().truncate(length)
+        self.generation_records = {generation: record_number for record_number, generation in enumerate(self.records()["generation"].tolist())}
+
+    def index(self) -> dict:
+        return self.generation_records
+
+    # The score statistics of every generation, like the old data.csv: (generation, total, mean, best) columns.
+    def statistics(self) -> np.ndarray:
+        records = self.records()
+
+        return np.stack([records["generation"], records["total"], records["mean"], records["best"]], axis=1)
+
+    # Get the genome of a champion of a generation. rank 0 is the best of that generation.
+    def champion(self, generation: int, rank: int = 0) -> np.ndarray:
+        record_number = self.generation_records[generation]
+
+        return np.array(self.records()[record_number]["champions"][rank])
+
+    # Make a network of a champion of a generation.
+    def load_network(self, generation: int, rank: int = 0) -> Network:
+        return Network(self.header["hidden_layer_count"], self.header["network_structure"], activation_function=self.header["activation_function"], genome=self.champion(generation, rank))
+
+    # Make an int8 network of a champion of a generation for serving, see nnetwork.classes.quantised.
+    def load_quantised_network(self, generation: int, rank: int = 0, calibration_inputs=None) -> QuantisedNetwork:
+        return QuantisedNetwork.from_network(self.load_network(generation, rank), calibration_inputs)
+
+    # Write the score statistics to a CSV file, with the columns data.csv used to have.
+    def write_csv(self, filename: str):
+        with open(filename, "wt") as fp:
+            fp.write("Generation,Score,BestScore\n")
+
+            for generation, total, _, best in self.statistics().tolist():
+                fp.write(f"{int(generation)},{total},{best}\n")
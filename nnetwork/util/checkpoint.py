@@ -0,0 +1,77 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+
+# A checkpoint is one file with a JSON header followed by raw arrays:
+# magic, version and header length, the header, and then every array aligned to ALIGNMENT bytes.
+# The arrays can be memory mapped, so loading does not have to read the whole population.
+CHECKPOINT_MAGIC = b"NNCKPT"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_PREFIX = struct.Struct("<6sHI")
+ALIGNMENT = 64
+
+
+def align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+# Write a checkpoint. The header has to be JSON serialisable, the arrays are stored as they are.
+def save(filename: str, header: dict, arrays: dict):
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # The offsets of the arrays are counted from the start of the data, so they do not depend on the header length.
+    entries = {}
+    data_length = 0
+    for name, array in arrays.items():
+        entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": data_length}
+        data_length = align(data_length + array.nbytes)
+
+    header_bytes = json.dumps({"header": header, "arrays": entries}).encode("utf-8")
+    data_start = align(CHECKPOINT_PREFIX.size + len(header_bytes))
+
+    # Write to a temporary file first. An old checkpoint that is still memory mapped keeps its contents,
+    # and a crash while saving does not leave a broken checkpoint behind.
+    temporary_filename = f"{filename}.tmp"
+    with open(temporary_filename, "wb") as fp:
+        fp.write(CHECKPOINT_PREFIX.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, len(header_bytes)))
+        fp.write(header_bytes)
+
+        for name, array in arrays.items():
+            fp.seek(data_start + entries[name]["offset"])
+            fp.write(array.data)
+
+        fp.truncate(data_start + data_length)
+
+    os.replace(temporary_filename, filename)
+
+
+# Read a checkpoint. Returns the header and the arrays, which are copy-on-write memory maps of the file:
+# changing them does not change the checkpoint.
+def load(filename: str) -> tuple:
+    with open(filename, "rb") as fp:
+        magic, version, header_length = CHECKPOINT_PREFIX.unpack(fp.read(CHECKPOINT_PREFIX.size))
+
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError(f"{filename} is not a checkpoint.")
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint {filename} has version {version}, expected {CHECKPOINT_VERSION}.")
+
+        contents = json.loads(fp.read(header_length).decode("utf-8"))
+
+    data_start = align(CHECKPOINT_PREFIX.size + header_length)
+
+    arrays = {}
+    for name, entry in contents["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+
+        # An empty array can not be mapped.
+        if dtype.itemsize * int(np.prod(shape)) == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(filename, dtype=dtype, mode="c", offset=data_start + entry["offset"], shape=shape).view(np.ndarray)
+
+    return contents["header"], arrays
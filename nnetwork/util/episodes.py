@@ -0,0 +1,44 @@
+import numpy as np
+
+
+# Turn network outputs into actions by picking the output with the highest value.
+def argmax_actions(outputs: np.ndarray) -> np.ndarray:
+    return np.argmax(outputs, axis=1)
+
+
+# Run one episode per specimen in lockstep, with specimen i playing instance i of the environment.
+# predict(specimen_ids, observations) returns the outputs of the given specimens.
+# Specimens stop when their episode is over or their step budget is used up.
+# Returns the total reward of every specimen.
+def run_episodes(predict, environment, population_size: int, max_steps: int = 1000, step_budgets=None, action_function=argmax_actions) -> np.ndarray:
+    if environment.batch_size != population_size:
+        raise ValueError(f"The environment has {environment.batch_size} instances, but there are {population_size} specimens.")
+
+    if step_budgets is None:
+        step_budgets = np.full(population_size, max_steps)
+    step_budgets = np.minimum(np.asarray(step_budgets), max_steps)
+
+    total_rewards = np.zeros(population_size, dtype=np.float64)
+    active = np.ones(population_size, dtype=bool)
+    actions = None
+
+    observations = environment.reset()
+
+    for step in range(max_steps):
+        active &= step < step_budgets
+
+        active_ids = np.flatnonzero(active)
+        if active_ids.shape[0] == 0:
+            break
+
+        # Only the specimens that are still playing make a move.
+        active_actions = action_function(predict(active_ids, observations[active_ids]))
+        if actions is None:
+            actions = np.zeros((population_size,) + active_actions.shape[1:], dtype=active_actions.dtype)
+        actions[active_ids] = active_actions
+        observations, rewards, done = environment.step(actions)
+
+        total_rewards[active_ids] += rewards[active_ids]
+        active &= ~np.asarray(done)
+
+    return total_rewards
@@ -1,9 +1,17 @@
-from .crossover_half import crossover_half
-from .crossover import crossover
-from .random_gene_copy import random_gene_copy
+from .crossover_half import crossover_half, crossover_half_batch
+from .crossover import crossover, crossover_batch
+from .random_gene_copy import random_gene_copy, random_gene_copy_batch
 
 breeding_functions = {
     "crossover": crossover,
     "crossover_half": crossover_half,
     "random_gene_copy": random_gene_copy,
 }
+
+# The same functions, but breeding many children at once.
+# They take two (children, genome_length) arrays of parent genomes and return the child genomes.
+batch_breeding_functions = {
+    "crossover": crossover_batch,
+    "crossover_half": crossover_half_batch,
+    "random_gene_copy": random_gene_copy_batch,
+}
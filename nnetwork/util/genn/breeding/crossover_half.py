@@ -1,57 +1,26 @@
-from nnetwork.classes.neuralnet import Network
-from nnetwork.util import rng
-
-
-def crossover_half(genn_object, network1: Network, network2: Network):
-    # Get the weights and biases of the first parent.
-    weights1, biases1 = network1.get_weights_and_biases()
-
-    # Do the same for the second parent.
-    weights2, biases2 = network2.get_weights_and_biases()
+import numpy as np
 
-    # Decide on a split point
-    split_point = rng.randint(0, sum(genn_object.network_structure) // 2)
-
-    # Keep track of whether the split has been surpassed.
-    split_point_passed = False
-
-    # Also keep track of how many neurons have been passed.
-    neurons_passed = 0
-
-    # Create a child nnetwork.
-    child = Network(genn_object.hidden_layer_count, genn_object.network_structure, activation_function=genn_object.activation_function)
+from nnetwork.classes.neuralnet import Network
 
-    # Perform the actual crossover.
-    for layer_index in range(len(weights1)):
-        for neuron_index in range(len(weights1[layer_index])):
-            # If the crossover point hasn't been reached yet, we use the first parent's biases.
-            # Otherwise use the second parent's biases.
-            if not split_point_passed:
-                parent_biases = biases1
-            else:
-                parent_biases = biases2
 
-            for connection_index in range(len(weights1[layer_index][neuron_index])):
-                # Do the same as above.
-                if not split_point_passed:
-                    parent_weights = weights1
-                else:
-                    parent_weights = weights2
+def crossover_half_batch(genn_object, genomes1: np.ndarray, genomes2: np.ndarray) -> np.ndarray:
+    layout = genn_object.genomes.layout
+    child_count = genomes1.shape[0]
 
-                # Select the parent weight.
-                parent_weight = parent_weights[layer_index][neuron_index][connection_index]
+    # Decide on a split point per child.
+    split_points = genn_object.rng.randint_array(0, layout.neuron_count // 2, child_count)
 
-                # Set the child neuron weights.
-                child.layers[layer_index][neuron_index].connections[connection_index][1] = parent_weight
+    # The neurons after the split point come from the second parent.
+    # The first neuron always comes from the first parent.
+    neuron_indices = np.arange(layout.neuron_count)
+    neuron_mask = neuron_indices >= np.maximum(split_points, 1)[:, np.newaxis]
 
-            # Get the parents neuron
-            parent_bias = parent_biases[layer_index][neuron_index]
+    # A neuron's bias and its outgoing weights come from the same parent.
+    return np.where(neuron_mask[:, layout.gene_neurons], genomes2, genomes1)
 
-            # Set the child neuron bias.
-            child.layers[layer_index][neuron_index].bias = parent_bias
 
-            neurons_passed += 1
-            if neurons_passed >= split_point and not split_point_passed:
-                split_point_passed = True
+def crossover_half(genn_object, network1: Network, network2: Network):
+    # Run the batch version on a batch of one.
+    child_genome = crossover_half_batch(genn_object, network1.genome[np.newaxis], network2.genome[np.newaxis])[0]
 
-    return child
+    return Network(genn_object.hidden_layer_count, genn_object.network_structure, activation_function=genn_object.activation_function, genome=child_genome, layout=genn_object.genomes.layout)
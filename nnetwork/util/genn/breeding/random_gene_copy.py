@@ -1,37 +1,22 @@
 # Do fully random choice of weights.
-from nnetwork.classes.neuralnet import Network
-from nnetwork.util import rng
-
+import numpy as np
 
-def random_gene_copy(genn_object, network1: Network, network2: Network):
-    # Get the weights and biases of the first parent.
-    weights1, biases1 = network1.get_weights_and_biases()
+from nnetwork.classes.neuralnet import Network
 
-    # Do the same for the second parent.
-    weights2, biases2 = network2.get_weights_and_biases()
 
-    # Generate a child.
-    child = Network(genn_object.hidden_layer_count, genn_object.network_structure, activation_function=genn_object.activation_function)
+def random_gene_copy_batch(genn_object, genomes1: np.ndarray, genomes2: np.ndarray) -> np.ndarray:
+    layout = genn_object.genomes.layout
+    child_count = genomes1.shape[0]
 
-    # Update the child weights.
-    for layer_index in range(len(weights1)):
-        for neuron_index in range(len(weights1[layer_index])):
-            parent_choice = rng.randint(0, 1)
+    # Every neuron picks a parent at random.
+    neuron_mask = genn_object.rng.randint_array(0, 1, (child_count, layout.neuron_count)) == 1
 
-            for connection_index in range(len(weights1[layer_index][neuron_index])):
-                # Pick the weight randomly
-                parent_weight = [
-                    weights1[layer_index][neuron_index][connection_index],
-                    weights2[layer_index][neuron_index][connection_index],
-                ][parent_choice]
+    # A neuron's bias and its outgoing weights come from the same parent.
+    return np.where(neuron_mask[:, layout.gene_neurons], genomes2, genomes1)
 
-                # Set the child weight
-                child.layers[layer_index][neuron_index].connections[connection_index][1] = parent_weight
 
-            # Set the child neuron's bias
-            child.layers[layer_index][neuron_index].bias = [
-                biases1[layer_index][neuron_index],
-                biases2[layer_index][neuron_index],
-            ][parent_choice]
+def random_gene_copy(genn_object, network1: Network, network2: Network):
+    # Run the batch version on a batch of one.
+    child_genome = random_gene_copy_batch(genn_object, network1.genome[np.newaxis], network2.genome[np.newaxis])[0]
 
-    return child
+    return Network(genn_object.hidden_layer_count, genn_object.network_structure, activation_function=genn_object.activation_function, genome=child_genome, layout=genn_object.genomes.layout)
@@ -0,0 +1,237 @@
+import collections
+
+import numpy as np
+
+from nnetwork.classes.genome import GenomeLayout
+from nnetwork.util import records
+
+
+# The lineage is kept in three record files, see nnetwork.util.records, named after a common prefix.
+LINEAGE_MAGIC = b"NNLIN\x00"
+
+
+def individual_dtype(neuron_count: int) -> np.dtype:
+    return np.dtype([
+        ("parents", "<i8", (2,)),
+        ("mask", "u1", ((neuron_count + 7) // 8,)),
+        ("mutation_start", "<i8"),
+        ("mutation_end", "<i8"),
+    ])
+
+
+def mutation_dtype(dtype) -> np.dtype:
+    return np.dtype([
+        ("index", "<i4"),
+        ("value", np.dtype(dtype).newbyteorder("<")),
+    ])
+
+
+def keyframe_dtype(genome_length: int, dtype) -> np.dtype:
+    return np.dtype([
+        ("individual", "<i8"),
+        ("genome", np.dtype(dtype).newbyteorder("<"), (genome_length,)),
+    ])
+
+
+# Keeps the history of every individual of a GeNNetic population, without storing every genome.
+# Individuals get an id in the order they are born. A child is stored as:
+#   - the ids of its parents,
+#   - which neurons it got from the second parent, one bit per neuron,
+#   - the genes that differ from that crossover, with their new value.
+# Genomes are rebuilt from their ancestors on demand. To keep rebuilding cheap, the full genomes of a generation
+# are stored every keyframe_interval generations, and the last cache_size rebuilt genomes are kept.
+# Values are stored as dtype, which should be the type the population is stored as.
+# Everything is appended to the files filename.individuals, filename.mutations and filename.keyframes as it is recorded,
+# so the history does not have to fit in memory and a checkpoint only has to store how long the files were.
+# Without truncate, the history in existing files is continued.
+class LineageRecorder:
+    def __init__(self, filename: str, layout: GenomeLayout, cache_size: int = 256, keyframe_interval: int = 8, dtype="float64", truncate: bool = True):
+        self.filename = filename
+        self.layout = layout
+        self.cache_size = cache_size
+        self.keyframe_interval = keyframe_interval
+        self.dtype = np.dtype(dtype).name
+
+        # The genes sorted by neuron, and where the genes of each neuron start, to reduce a gene mask to a neuron mask.
+        self.gene_order = np.argsort(layout.gene_neurons, kind="stable")
+        self.neuron_starts = np.searchsorted(layout.gene_neurons[self.gene_order], np.arange(layout.neuron_count))
+
+        header = {"network_structure": layout.network_structure, "dtype": self.dtype}
+
+        # Per individual its parents, -1 for the individuals of the first generation, its neuron mask,
+        # and where its changed genes are in the mutations file.
+        self.individuals = records.RecordFile(f"{filename}.individuals", LINEAGE_MAGIC, "lineage file", header, individual_dtype(layout.neuron_count), truncate)
+        self.mutations = records.RecordFile(f"{filename}.mutations", LINEAGE_MAGIC, "lineage file", header, mutation_dtype(self.dtype), truncate)
+
+        # Individuals with a full genome stored, and the record of that genome.
+        self.keyframes = records.RecordFile(f"{filename}.keyframes", LINEAGE_MAGIC, "lineage file", header, keyframe_dtype(layout.genome_length, self.dtype), truncate)
+        self.keyframe_ids = {}
+        self.load_keyframe_ids()
+
+        self.cache = collections.OrderedDict()
+
+    def load_keyframe_ids(self):
+        self.keyframe_ids = {individual_id: record for record, individual_id in enumerate(self.keyframes.records()["individual"].tolist())}
+
+    # The amount of records in each file, to store in a checkpoint.
+    def lengths(self) -> list:
+        return [len(self.individuals), len(self.mutations), len(self.keyframes)]
+
+    # Go back to the lengths of a checkpoint, dropping everything that was recorded after it.
+    def truncate(self, lengths: list):
+        for record_file, length in zip((self.individuals, self.mutations, self.keyframes), lengths):
+            record_file.truncate(length)
+
+        self.load_keyframe_ids()
+        self.cache.clear()
+
+    # The amount of individuals recorded.
+    def __len__(self) -> int:
+        return len(self.individuals)
+
+    # Record the individuals of the first generation, which have no parents. Returns their ids.
+    def record_roots(self, genomes: np.ndarray) -> np.ndarray:
+        individual_ids = np.arange(len(self), len(self) + genomes.shape[0])
+
+        roots = np.zeros(genomes.shape[0], dtype=self.individuals.dtype)
+        roots["parents"] = -1
+        roots["mutation_start"] = len(self.mutations)
+        roots["mutation_end"] = len(self.mutations)
+
+        self.individuals.append(roots)
+        self.add_keyframes(individual_ids, genomes)
+
+        return individual_ids
+
+    # Record a batch of children, with the ids and genomes of both parents of every child. Returns their ids.
+    def record_children(self, parents1: np.ndarray, parents2: np.ndarray, genomes1: np.ndarray, genomes2: np.ndarray, children: np.ndarray) -> np.ndarray:
+        return self.append_children(self.encode_children(parents1, parents2, genomes1, genomes2, children))
+
+    # Turn a batch of children into records, without writing anything, so it can be done on a background thread.
+    # The mutation ranges of the records start at 0, append_children() moves them to the end of the mutations file.
+    def encode_children(self, parents1: np.ndarray, parents2: np.ndarray, genomes1: np.ndarray, genomes2: np.ndarray, children: np.ndarray) -> tuple:
+        # A neuron came from the second parent if any of its genes matches the second parent and not the first.
+        from_second = (children == genomes2) & (children != genomes1)
+        neuron_masks = np.logical_or.reduceat(from_second[:, self.gene_order], self.neuron_starts, axis=1)
+
+        # Everything that crossover does not explain is stored as it is, so the rebuilt genome is exact.
+        crossed = np.where(neuron_masks[:, self.layout.gene_neurons], genomes2, genomes1)
+        changed_children, changed_genes = np.nonzero(children != crossed)
+
+        mutation_counts = np.bincount(changed_children, minlength=children.shape[0])
+        mutation_ends = np.cumsum(mutation_counts)
+
+        new_individuals = np.zeros(children.shape[0], dtype=self.individuals.dtype)
+        new_individuals["parents"] = np.stack([parents1, parents2], axis=1)
+        new_individuals["mask"] = np.packbits(neuron_masks, axis=1)
+        new_individuals["mutation_start"] = mutation_ends - mutation_counts
+        new_individuals["mutation_end"] = mutation_ends
+
+        new_mutations = np.zeros(changed_genes.shape[0], dtype=self.mutations.dtype)
+        new_mutations["index"] = changed_genes
+        new_mutations["value"] = children[changed_children, changed_genes]
+
+        return new_individuals, new_mutations
+
+    # Write children encoded by encode_children(). Returns their ids.
+    def append_children(self, encoded_children: tuple) -> np.ndarray:
+        new_individuals, new_mutations = encoded_children
+        individual_ids = np.arange(len(self), len(self) + new_individuals.shape[0])
+
+        new_individuals = new_individuals.copy()
+        new_individuals["mutation_start"] += len(self.mutations)
+        new_individuals["mutation_end"] += len(self.mutations)
+
+        # The mutations go first, so an individual never points past the end of the mutations file.
+        self.mutations.append(new_mutations)
+        self.individuals.append(new_individuals)
+
+        return individual_ids
+
+    # Store the full genomes of individuals, so rebuilding their descendants stops there.
+    def add_keyframes(self, individual_ids: np.ndarray, genomes: np.ndarray):
+        rows = [row for row, individual_id in enumerate(individual_ids.tolist()) if individual_id not in self.keyframe_ids]
+
+        new_keyframes = np.zeros(len(rows), dtype=self.keyframes.dtype)
+        new_keyframes["individual"] = individual_ids[rows]
+        new_keyframes["genome"] = genomes[rows]
+
+        first_record = len(self.keyframes)
+        self.keyframes.append(new_keyframes)
+
+        for record, individual_id in enumerate(new_keyframes["individual"].tolist(), first_record):
+            self.keyframe_ids[individual_id] = record
+
+    # Called for every generation that is complete. Stores the generation in full every keyframe_interval generations.
+    def record_generation(self, generation: int, individual_ids: np.ndarray, genomes: np.ndarray):
+        if self.keyframe_interval is not None and generation % self.keyframe_interval == 0:
+            self.add_keyframes(individual_ids, genomes)
+
+    # The ids of the parents of an individual, or (-1, -1) for the first generation.
+    def parents_of(self, individual_id: int) -> tuple:
+        parent1, parent2 = self.individuals.records()["parents"][individual_id].tolist()
+
+        return parent1, parent2
+
+    # Rebuild the genome of an individual.
+    def genome(self, individual_id: int) -> np.ndarray:
+        genomes = self.genomes([individual_id])
+
+        return genomes[individual_id].copy()
+
+    # Rebuild the genomes of many individuals at once, sharing the work on common ancestors.
+    # Returns a dictionary of individual id to genome, which also holds the ancestors that were rebuilt.
+    def genomes(self, individual_ids) -> dict:
+        individuals = self.individuals.records()
+        mutations = self.mutations.records()
+        keyframes = self.keyframes.records()
+
+        known = {}
+
+        # Find every ancestor that has to be rebuilt, stopping at keyframes and cached genomes.
+        missing = set()
+        stack = [int(individual_id) for individual_id in individual_ids]
+
+        while stack:
+            individual_id = stack.pop()
+            if individual_id in missing or individual_id in known:
+                continue
+
+            if individual_id in self.keyframe_ids:
+                known[individual_id] = np.array(keyframes[self.keyframe_ids[individual_id]]["genome"], dtype=self.dtype)
+            elif individual_id in self.cache:
+                self.cache.move_to_end(individual_id)
+                known[individual_id] = self.cache[individual_id]
+            else:
+                missing.add(individual_id)
+                stack.extend(individuals[individual_id]["parents"].tolist())
+
+        # Parents are born before their children, so rebuilding in order of id always has the parents ready.
+        for individual_id in sorted(missing):
+            individual = individuals[individual_id]
+            parent1, parent2 = individual["parents"].tolist()
+
+            neuron_mask = np.unpackbits(individual["mask"])[:self.layout.neuron_count].astype(bool)
+            genome = np.where(neuron_mask[self.layout.gene_neurons], known[parent2], known[parent1])
+
+            changes = mutations[int(individual["mutation_start"]):int(individual["mutation_end"])]
+            genome[changes["index"]] = changes["value"]
+
+            known[individual_id] = genome
+
+        # Keep the requested genomes for next time, and forget the ones that were not used for the longest.
+        if self.cache_size:
+            for individual_id in individual_ids:
+                individual_id = int(individual_id)
+                if individual_id not in self.keyframe_ids:
+                    self.cache[individual_id] = known[individual_id]
+                    self.cache.move_to_end(individual_id)
+
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return known
+
+    # The amount of bytes of the recorded history on disk.
+    def nbytes(self) -> int:
+        return sum(record_file.nbytes() for record_file in (self.individuals, self.mutations, self.keyframes))
@@ -0,0 +1,25 @@
+import numpy as np
+
+from nnetwork.classes.neuralnet import Network
+
+
+# Make a child of two networks that can have a different structure.
+# The child gets the structure of one of the parents, chosen at random, and starts as a copy of that parent.
+# neuron_mask_function(neuron_count) decides which neurons of the child come from the second parent.
+# Those neurons take the genes of the second parent where it has them, see GenomeLayout.copy_genes().
+def combine_networks(neat_object, network1: Network, network2: Network, neuron_mask_function) -> Network:
+    structure_parent = [network1, network2][neat_object.rng.randint(0, 1)]
+    layout = structure_parent.layout
+
+    # Line up the genes of both parents with the structure of the child.
+    aligned_genomes = []
+    for network in (network1, network2):
+        aligned_genome = structure_parent.genome.copy()
+        network.layout.copy_genes(network.genome, layout, aligned_genome)
+        aligned_genomes.append(aligned_genome)
+
+    # A neuron's bias and its outgoing weights come from the same parent.
+    neuron_mask = neuron_mask_function(layout.neuron_count)
+    child_genome = np.where(neuron_mask[layout.gene_neurons], aligned_genomes[1], aligned_genomes[0])
+
+    return Network(structure_parent.hidden_layer_count, structure_parent.network_structure, activation_function=neat_object.activation_function, genome=child_genome, layout=layout)
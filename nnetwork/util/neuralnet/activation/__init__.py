@@ -1,11 +1,26 @@
-from .binary import binary_step
-from .relu import relu
-from .sigmoid import sigmoid
-from .tanh import tanh
+from .binary import binary_step, binary_step_array
+from .hard_sigmoid import hard_sigmoid, hard_sigmoid_array
+from .hard_tanh import hard_tanh, hard_tanh_array
+from .relu import relu, relu_array
+from .sigmoid import sigmoid, sigmoid_array
+from .tanh import tanh, tanh_array
 
 activation_functions = {
     "binary": binary_step,
+    "hard_sigmoid": hard_sigmoid,
+    "hard_tanh": hard_tanh,
     "relu": relu,
     "sigmoid": sigmoid,
     "tanh": tanh,
 }
+
+# The same functions, but working element-wise on NumPy arrays of summed inputs, single vectors as well as batches.
+# These are used by every forward pass. hard_sigmoid and hard_tanh are fast approximations of sigmoid and tanh.
+array_activation_functions = {
+    "binary": binary_step_array,
+    "hard_sigmoid": hard_sigmoid_array,
+    "hard_tanh": hard_tanh_array,
+    "relu": relu_array,
+    "sigmoid": sigmoid_array,
+    "tanh": tanh_array,
+}
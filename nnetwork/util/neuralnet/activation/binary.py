@@ -1,3 +1,11 @@
+import numpy as np
+
+
 # Apply binary activation.
 def binary_step(inputs: list) -> float:
     return 1 if sum(inputs) > 0 else 0
+
+
+# Apply binary activation element-wise over an array of summed inputs.
+def binary_step_array(values: np.ndarray) -> np.ndarray:
+    return (values > 0).astype(values.dtype)
@@ -0,0 +1,15 @@
+import numpy as np
+
+
+# A fast piecewise-linear approximation of sigmoid: 0 below -2.5, 1 above 2.5 and a straight line in between.
+# It differs at most 0.08 from sigmoid, and is a lot faster to compute since there is no exponent.
+def hard_sigmoid(inputs: list) -> float:
+    return min(1, max(0, 0.2 * sum(inputs) + 0.5))
+
+
+# Apply hard sigmoid activation element-wise over an array of summed inputs.
+def hard_sigmoid_array(values: np.ndarray) -> np.ndarray:
+    result = np.multiply(values, 0.2)
+    result += 0.5
+
+    return np.clip(result, 0, 1, out=result)
@@ -0,0 +1,12 @@
+import numpy as np
+
+
+# A fast piecewise-linear approximation of TanH: -1 below -1, 1 above 1 and the input itself in between.
+# It differs at most 0.24 from TanH.
+def hard_tanh(inputs: list) -> float:
+    return min(1, max(-1, sum(inputs)))
+
+
+# Apply hard TanH activation element-wise over an array of summed inputs.
+def hard_tanh_array(values: np.ndarray) -> np.ndarray:
+    return np.clip(values, -1, 1)
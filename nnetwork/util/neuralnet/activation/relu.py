@@ -1,3 +1,13 @@
+import numpy as np
+
+
 # Apply ReLU activation.
 def relu(inputs: list) -> float:
-    return 0 if sum(inputs) < 0 else sum(inputs)
+    value = sum(inputs)
+
+    return 0 if value < 0 else value
+
+
+# Apply ReLU activation element-wise over an array of summed inputs.
+def relu_array(values: np.ndarray) -> np.ndarray:
+    return np.maximum(values, 0)
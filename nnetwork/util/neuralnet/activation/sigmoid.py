@@ -1,14 +1,30 @@
 # Apply sigmoid activation.
 import math
 
+import numpy as np
+
 
 def sigmoid(inputs: list) -> float:
-    try:
-        value = 1 / (1 + math.e ** (- sum(inputs)))
-    except OverflowError:
-        if sum(inputs) > 0:
-            value = 1
-        else:
-            value = 0
-
-    return value
+    value = sum(inputs)
+
+    # Only take the exponent of a value below 0, so it cannot overflow.
+    if value >= 0:
+        return 1 / (1 + math.exp(-value))
+
+    exponent = math.exp(value)
+    return exponent / (1 + exponent)
+
+
+# Apply sigmoid activation element-wise over an array of summed inputs.
+# Works on single vectors as well as batches.
+def sigmoid_array(values: np.ndarray) -> np.ndarray:
+    # sigmoid(x) = (1 + tanh(x / 2)) / 2. Unlike the exponent, tanh cannot overflow, so nothing has to be clipped,
+    # and it is cheap on the small vectors of a single prediction as well as on large batches.
+    result = np.multiply(values, 0.5)
+
+    # Done in place, without making a new array for every step.
+    np.tanh(result, out=result)
+    result *= 0.5
+    result += 0.5
+
+    return result
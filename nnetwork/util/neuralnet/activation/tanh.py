@@ -1,14 +1,15 @@
 # Apply TanH activation.
 import math
 
+import numpy as np
+
 
 def tanh(inputs: list) -> float:
-    try:
-        value = (math.e ** sum(inputs) - math.e ** -sum(inputs)) / (math.e ** sum(inputs) + math.e ** -sum(inputs))
-    except OverflowError:
-        if sum(inputs) > 0:
-            value = 1
-        else:
-            value = -1
-
-    return value
+    # math.tanh is exact for large values, it does not overflow.
+    return math.tanh(sum(inputs))
+
+
+# Apply TanH activation element-wise over an array of summed inputs.
+# Works on single vectors as well as batches.
+def tanh_array(values: np.ndarray) -> np.ndarray:
+    return np.tanh(values)
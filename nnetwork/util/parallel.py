@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from nnetwork.classes.genome import GenomeLayout
+from nnetwork.classes.neuralnet import Network
+from nnetwork.util import seedchain
+
+
+# The state of a worker process, set up once by initialise_worker.
+worker_state = {}
+
+
+def initialise_worker(memory_name: str, genome_count: int, dtype: str, specimen_genomes: list, activation_function: str, fitness_function):
+    # Attach to the shared genomes instead of receiving pickled networks.
+    memory = shared_memory.SharedMemory(name=memory_name)
+
+    worker_state["memory"] = memory
+    worker_state["genomes"] = np.ndarray((genome_count,), dtype=dtype, buffer=memory.buf)
+    worker_state["specimen_genomes"] = specimen_genomes
+    worker_state["activation_function"] = activation_function
+    worker_state["fitness_function"] = fitness_function
+
+    # Specimens with the same structure share a layout.
+    worker_state["layouts"] = {}
+
+
+def evaluate_specimen(specimen_id: int) -> tuple:
+    offset, hidden_layer_count, network_structure = worker_state["specimen_genomes"][specimen_id]
+
+    layout_key = tuple(network_structure)
+    if layout_key not in worker_state["layouts"]:
+        worker_state["layouts"][layout_key] = GenomeLayout(network_structure)
+    layout = worker_state["layouts"][layout_key]
+
+    # Make a network that is a view on the shared genome.
+    genome = worker_state["genomes"][offset:offset + layout.genome_length]
+    network = Network(hidden_layer_count, network_structure, activation_function=worker_state["activation_function"], genome=genome, layout=layout)
+
+    return specimen_id, worker_state["fitness_function"](network)
+
+
+# Evaluate every specimen with fitness_function(network) -> float, spread over a pool of processes.
+# The genomes of all specimens are put back to back in one flat array and shared with the workers.
+# specimen_genomes holds (offset in the flat array, hidden layer count, network structure) per specimen.
+# The genomes are shared in the type they are stored as, so float32 and float16 populations share less memory.
+def evaluate_genomes(genomes: np.ndarray, specimen_genomes: list, activation_function: str, fitness_function, workers: int = None) -> dict:
+    if workers is None:
+        workers = os.cpu_count()
+
+    # There is nothing to share with a single worker.
+    if workers <= 1:
+        worker_state.update(genomes=genomes, specimen_genomes=specimen_genomes, activation_function=activation_function, fitness_function=fitness_function, layouts={})
+
+        try:
+            return dict(evaluate_specimen(specimen_id) for specimen_id in range(len(specimen_genomes)))
+        finally:
+            worker_state.clear()
+
+    memory = shared_memory.SharedMemory(create=True, size=max(genomes.nbytes, 1))
+
+    try:
+        np.ndarray(genomes.shape, dtype=genomes.dtype, buffer=memory.buf)[:] = genomes
+
+        with multiprocessing.Pool(workers, initializer=initialise_worker, initargs=(memory.name, genomes.shape[0], genomes.dtype.str, specimen_genomes, activation_function, fitness_function)) as pool:
+            # Hand out the specimens in chunks, so the workers do not wait on each other.
+            chunk_size = max(1, len(specimen_genomes) // (workers * 4))
+
+            # The results come in as the workers finish. They are sorted by specimen,
+            # because the parents are chosen in the order of the scores and a seeded run has to breed the same way every time.
+            return dict(sorted(pool.imap_unordered(evaluate_specimen, range(len(specimen_genomes)), chunksize=chunk_size)))
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def initialise_chain_worker(chains: list, known_genomes: dict, hidden_layer_count: int, network_structure: list, activation_function: str, fitness_function):
+    worker_state["chains"] = chains
+    worker_state["known_genomes"] = known_genomes
+    worker_state["hidden_layer_count"] = hidden_layer_count
+    worker_state["layout"] = GenomeLayout(network_structure)
+    worker_state["activation_function"] = activation_function
+    worker_state["fitness_function"] = fitness_function
+
+
+def attach_chain_worker(memory_name: str, parent_keys: list, genome_length: int, chains: list, *args):
+    # Attach to the shared genomes of the parents, and look them up by the bytes of their chain.
+    memory = shared_memory.SharedMemory(name=memory_name)
+    parent_genomes = np.ndarray((len(parent_keys), genome_length), dtype=np.float64, buffer=memory.buf)
+
+    initialise_chain_worker(chains, dict(zip(parent_keys, parent_genomes)), *args)
+    worker_state["memory"] = memory
+
+
+def evaluate_chain(specimen_id: int) -> tuple:
+    # The worker makes the genome from its seeds itself, so only the seeds are sent.
+    # A child of a known parent only needs its last mutation.
+    layout = worker_state["layout"]
+    genome = seedchain.materialise_from(layout, worker_state["chains"][specimen_id], worker_state["known_genomes"])
+    network = Network(worker_state["hidden_layer_count"], layout.network_structure, activation_function=worker_state["activation_function"], genome=genome, layout=layout)
+
+    return specimen_id, worker_state["fitness_function"](network)
+
+
+# Evaluate every specimen of a SeedChainGeNNetic with fitness_function(network) -> float, spread over a pool of processes.
+# Only the seed chains are sent to the workers, which is a few bytes per generation of every specimen.
+# parent_genomes maps the bytes of a chain to its genome, like SeedChainGeNNetic.parent_genomes.
+# They are shared with the workers, so the children of those parents are made with a single mutation.
+def evaluate_chains(chains: list, parent_genomes: dict, hidden_layer_count: int, network_structure: list, activation_function: str, fitness_function, workers: int = None) -> dict:
+    if workers is None:
+        workers = os.cpu_count()
+
+    initargs = (hidden_layer_count, network_structure, activation_function, fitness_function)
+
+    if workers <= 1:
+        initialise_chain_worker(chains, parent_genomes, *initargs)
+
+        try:
+            return dict(evaluate_chain(specimen_id) for specimen_id in range(len(chains)))
+        finally:
+            worker_state.clear()
+
+    genome_length = GenomeLayout(network_structure).genome_length
+    parent_keys = list(parent_genomes.keys())
+    memory = shared_memory.SharedMemory(create=True, size=max(len(parent_keys) * genome_length * 8, 1))
+
+    try:
+        shared_genomes = np.ndarray((len(parent_keys), genome_length), dtype=np.float64, buffer=memory.buf)
+        for row, key in enumerate(parent_keys):
+            shared_genomes[row] = parent_genomes[key]
+
+        # The memory can only be closed once no array uses it anymore.
+        del shared_genomes
+
+        with multiprocessing.Pool(workers, initializer=attach_chain_worker, initargs=(memory.name, parent_keys, genome_length, chains) + initargs) as pool:
+            chunk_size = max(1, len(chains) // (workers * 4))
+
+            # Sorted by specimen, like in evaluate_genomes.
+            return dict(sorted(pool.imap_unordered(evaluate_chain, range(len(chains)), chunksize=chunk_size)))
+    finally:
+        memory.close()
+        memory.unlink()
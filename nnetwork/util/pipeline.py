@@ -0,0 +1,51 @@
+import concurrent.futures
+
+
+# Breeds the next generation on a background thread while the last specimens are still being evaluated.
+# Once threshold * population_size specimens have a score, start() hands the breeding to the thread.
+# The parents come from the specimens that are scored by then, the generation is finished with collect().
+class BreedingPipeline:
+    def __init__(self, threshold: float):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"The pipeline threshold should be between 0 and 1, got {threshold}.")
+
+        self.threshold = threshold
+        self.executor = None
+        self.future = None
+
+    # Whether enough specimens have been scored to start breeding, and it has not been started yet.
+    def ready(self, scored_count: int, population_size: int) -> bool:
+        # With every specimen scored, breeding in the background would not overlap with anything.
+        return self.future is None and self.threshold * population_size <= scored_count < population_size
+
+    # Run breed_function() on the background thread.
+    def start(self, breed_function):
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="breeding")
+
+        self.future = self.executor.submit(breed_function)
+
+    # Wait for the offspring bred in the background. Returns None if nothing was started.
+    def collect(self):
+        if self.future is None:
+            return None
+
+        future, self.future = self.future, None
+
+        return future.result()
+
+    # Throw away offspring that are being bred, for example when the generation is replaced.
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+            concurrent.futures.wait([self.future])
+            self.future = None
+
+    # The thread can not be pickled. A saved object breeds the generation again when it is loaded.
+    def __getstate__(self) -> dict:
+        return {"threshold": self.threshold}
+
+    def __setstate__(self, state: dict):
+        self.threshold = state["threshold"]
+        self.executor = None
+        self.future = None
@@ -0,0 +1,111 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+
+# A record file is an append-only file of fixed-size records, like the hall of fame and the lineage use.
+# It starts with magic, version and header length, then a JSON header padded to ALIGNMENT bytes,
+# followed by the records. Record i starts at data_start + i * record_size,
+# so any record can be read from a memory map without reading the rest of the file.
+RECORD_VERSION = 1
+RECORD_PREFIX = struct.Struct("<6sHI")
+ALIGNMENT = 64
+
+
+def align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class RecordFile:
+    # Open the file, or make it if it does not exist. With truncate, an existing file is started over.
+    # magic tells what kind of file it is, kind names that kind in error messages.
+    # An existing file has to have the same header, so its records have the same layout.
+    def __init__(self, filename: str, magic: bytes, kind: str, header: dict, dtype: np.dtype, truncate: bool = False):
+        self.filename = filename
+        self.magic = magic
+        self.kind = kind
+        self.header = header
+        self.dtype = np.dtype(dtype)
+
+        if truncate or not os.path.exists(filename):
+            self.write_header()
+        else:
+            self.check_header()
+
+        self.fp = None
+        self.open()
+
+    def write_header(self):
+        header_bytes = json.dumps(self.header).encode("utf-8")
+        self.data_start = align(RECORD_PREFIX.size + len(header_bytes))
+
+        with open(self.filename, "wb") as fp:
+            fp.write(RECORD_PREFIX.pack(self.magic, RECORD_VERSION, len(header_bytes)))
+            fp.write(header_bytes)
+            fp.truncate(self.data_start)
+
+    # Make sure an existing file has records of the same layout.
+    def check_header(self):
+        with open(self.filename, "rb") as fp:
+            magic, version, header_length = RECORD_PREFIX.unpack(fp.read(RECORD_PREFIX.size))
+
+            if magic != self.magic:
+                raise ValueError(f"{self.filename} is not a {self.kind}.")
+            if version != RECORD_VERSION:
+                raise ValueError(f"The {self.kind} {self.filename} has version {version}, expected {RECORD_VERSION}.")
+
+            header = json.loads(fp.read(header_length).decode("utf-8"))
+
+        if header != self.header:
+            raise ValueError(f"The {self.kind} {self.filename} was made for {header}, not {self.header}.")
+
+        self.data_start = align(RECORD_PREFIX.size + header_length)
+
+    def open(self):
+        # A record that was only partly written when the program stopped is dropped.
+        self.fp = open(self.filename, "r+b")
+        self.truncate(len(self))
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+    # The amount of complete records.
+    def __len__(self) -> int:
+        return max(0, os.path.getsize(self.filename) - self.data_start) // self.dtype.itemsize
+
+    # Drop every record after the first length records, for example the ones written after a checkpoint was saved.
+    def truncate(self, length: int):
+        self.fp.truncate(self.data_start + length * self.dtype.itemsize)
+        self.fp.seek(0, os.SEEK_END)
+
+    # Add an array of records, which is written to disk straight away.
+    def append(self, records: np.ndarray):
+        self.fp.write(np.ascontiguousarray(records, dtype=self.dtype).tobytes())
+        self.fp.flush()
+
+    # All records as a read-only memory map. Records appended later are not in it.
+    def records(self) -> np.ndarray:
+        count = len(self)
+        if count == 0:
+            return np.zeros(0, dtype=self.dtype)
+
+        return np.memmap(self.filename, dtype=self.dtype, mode="r", offset=self.data_start, shape=(count,))
+
+    # The amount of bytes of the records on disk.
+    def nbytes(self) -> int:
+        return len(self) * self.dtype.itemsize
+
+    # The open file can not be pickled, it is opened again when loading.
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["fp"] = None
+
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.open()
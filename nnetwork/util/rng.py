@@ -1,28 +1,104 @@
-import random
+import numpy as np
 
 
-NUMBERS_GENERATED = 0
+class RNG:
+    def __init__(self, seed=None):
+        # The seed sequence is seeded once. Without a seed, it takes entropy from the OS.
+        # Child streams for parallel workers are spawned from it.
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.generator = np.random.Generator(np.random.PCG64(self.seed_sequence))
 
+    def random_gaussian(self, mean=0, std_deviation=1):
+        return float(self.generator.normal(mean, std_deviation))
 
-def random_check():
-    random.seed()
+    # Both a and b are included.
+    def randint(self, a, b):
+        return int(self.generator.integers(a, b, endpoint=True))
+
+    def random_number(self):
+        return float(self.generator.random())
+
+    def choice(self, seq):
+        return seq[self.randint(0, len(seq) - 1)]
+
+    def random_array(self, shape):
+        return self.generator.random(shape)
+
+    def random_gaussian_array(self, shape, mean=0, std_deviation=1):
+        return self.generator.normal(mean, std_deviation, shape)
+
+    # Like randint, both a and b are included. They can also be arrays of bounds.
+    def randint_array(self, a, b, shape=None):
+        return self.generator.integers(a, b, size=shape, endpoint=True)
+
+    # Make independent random streams, for example one per parallel worker.
+    def spawn(self, count: int) -> list:
+        children = []
+
+        for seed_sequence in self.seed_sequence.spawn(count):
+            child = RNG.__new__(RNG)
+            child.seed_sequence = seed_sequence
+            child.generator = np.random.Generator(np.random.PCG64(seed_sequence))
+            children.append(child)
+
+        return children
+
+    # Get the full state, so a run can be resumed exactly where it stopped.
+    # Everything in it can be stored as JSON.
+    def get_state(self) -> dict:
+        return {
+            "entropy": self.seed_sequence.entropy,
+            "spawn_key": list(self.seed_sequence.spawn_key),
+            "children_spawned": self.seed_sequence.n_children_spawned,
+            "bit_generator": self.generator.bit_generator.state,
+        }
+
+    def set_state(self, state: dict):
+        self.seed_sequence = np.random.SeedSequence(state["entropy"], spawn_key=tuple(state["spawn_key"]), n_children_spawned=state["children_spawned"])
+        self.generator = np.random.Generator(np.random.PCG64(self.seed_sequence))
+        self.generator.bit_generator.state = state["bit_generator"]
+
+    # Pickle through the state, so saved objects stay readable across NumPy versions.
+    def __getstate__(self) -> dict:
+        return self.get_state()
+
+    def __setstate__(self, state: dict):
+        self.set_state(state)
+
+
+# The generator used by the functions below.
+DEFAULT_RNG = RNG()
+
+
+# Seed the default generator, to make runs reproducible.
+def seed(value=None):
+    DEFAULT_RNG.set_state(RNG(value).get_state())
 
 
 def random_gaussian(mean=0, std_deviation=1):
-    random_check()
-    return random.gauss(mean, std_deviation)
+    return DEFAULT_RNG.random_gaussian(mean, std_deviation)
 
 
 def randint(a, b):
-    random_check()
-    return random.randint(a, b)
+    return DEFAULT_RNG.randint(a, b)
 
 
 def random_number():
-    random_check()
-    return random.random()
+    return DEFAULT_RNG.random_number()
 
 
 def choice(seq):
-    random_check()
-    return random.choice(seq)
+    return DEFAULT_RNG.choice(seq)
+
+
+def random_array(shape):
+    return DEFAULT_RNG.random_array(shape)
+
+
+def random_gaussian_array(shape, mean=0, std_deviation=1):
+    return DEFAULT_RNG.random_gaussian_array(shape, mean, std_deviation)
+
+
+# Like randint, both a and b are included. They can also be arrays of bounds.
+def randint_array(a, b, shape=None):
+    return DEFAULT_RNG.randint_array(a, b, shape)
@@ -0,0 +1,13 @@
+from .rank import rank
+from .roulette import roulette
+from .stochastic_universal_sampling import stochastic_universal_sampling
+from .tournament import tournament
+
+# Functions to choose parents. They take the fitness of every specimen as an array
+# and return the indices of count parents.
+selection_functions = {
+    "rank": rank,
+    "roulette": roulette,
+    "stochastic_universal_sampling": stochastic_universal_sampling,
+    "tournament": tournament,
+}
@@ -0,0 +1,19 @@
+import numpy as np
+
+
+# Choose parents with a chance proportional to their rank: the worst has rank 1, the best rank n.
+# This keeps the selection pressure the same, no matter how far apart the fitness values are.
+def rank(genn_object, fitness: np.ndarray, count: int) -> np.ndarray:
+    ranks = np.empty(fitness.shape[0], dtype=np.float64)
+    ranks[np.argsort(fitness, kind="stable")] = np.arange(1, fitness.shape[0] + 1)
+
+    # Specimens with the same fitness share the average of their ranks.
+    _, fitness_groups = np.unique(fitness, return_inverse=True)
+    ranks = (np.bincount(fitness_groups, weights=ranks) / np.bincount(fitness_groups))[fitness_groups]
+
+    # Run a roulette on the ranks.
+    cumulative_ranks = np.cumsum(ranks)
+    passing_points = genn_object.rng.random_array(count) * cumulative_ranks[-1]
+    parents = np.searchsorted(cumulative_ranks, passing_points, side="right")
+
+    return np.minimum(parents, fitness.shape[0] - 1)
@@ -0,0 +1,17 @@
+import numpy as np
+
+
+# Choose parents with a chance proportional to their fitness.
+def roulette(genn_object, fitness: np.ndarray, count: int) -> np.ndarray:
+    # Make the cumulative fitness once. Negative fitness counts as zero.
+    cumulative_fitness = np.cumsum(np.maximum(fitness, 0))
+
+    # Without any fitness, every specimen has the same chance.
+    if cumulative_fitness[-1] <= 0:
+        return genn_object.rng.randint_array(0, fitness.shape[0] - 1, count)
+
+    # Generate the random choosing points and find where the running sum passes them.
+    passing_points = genn_object.rng.random_array(count) * cumulative_fitness[-1]
+    parents = np.searchsorted(cumulative_fitness, passing_points, side="right")
+
+    return np.minimum(parents, fitness.shape[0] - 1)
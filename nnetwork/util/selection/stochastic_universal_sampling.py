@@ -0,0 +1,20 @@
+import numpy as np
+
+
+# Like roulette, but with evenly spaced choosing points from a single random start.
+# Every specimen gets close to its expected amount of children.
+def stochastic_universal_sampling(genn_object, fitness: np.ndarray, count: int) -> np.ndarray:
+    # Make the cumulative fitness once. Negative fitness counts as zero.
+    cumulative_fitness = np.cumsum(np.maximum(fitness, 0))
+
+    # Without any fitness, every specimen has the same chance.
+    if cumulative_fitness[-1] <= 0:
+        return genn_object.rng.randint_array(0, fitness.shape[0] - 1, count)
+
+    # Space the choosing points evenly, starting at a random point in the first gap.
+    step = cumulative_fitness[-1] / count
+    passing_points = (genn_object.rng.random_array(1) + np.arange(count)) * step
+    parents = np.minimum(np.searchsorted(cumulative_fitness, passing_points, side="right"), fitness.shape[0] - 1)
+
+    # The parents come out sorted, shuffle them so the pairs are random.
+    return parents[np.argsort(genn_object.rng.random_array(count))]
@@ -0,0 +1,9 @@
+import numpy as np
+
+
+# Let groups of tournament_size random specimens compete. The fittest of each group is a parent.
+def tournament(genn_object, fitness: np.ndarray, count: int) -> np.ndarray:
+    contestants = genn_object.rng.randint_array(0, fitness.shape[0] - 1, (count, genn_object.tournament_size))
+    winners = np.argmax(fitness[contestants], axis=1)
+
+    return contestants[np.arange(count), winners]
@@ -13,6 +13,9 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/EyeDevelop/NEATNetwork",
     packages=setuptools.find_packages(),
+    install_requires=[
+        "numpy",
+    ],
     classifiers=[
         "Programming Language :: Python :: 3",
         "Operating System :: OS Independent",
@@ -1,78 +1,193 @@
+import asyncio
 import errno
 import logging
 import os
-import pickle
-import queue
-import select
-import socket
-import time
+import struct
 import traceback
 
+import numpy as np
+
 from nnetwork.classes.gennetic import GeNNetic
+from nnetwork.util import archive
+
+
+# The binary protocol sends frames of a header followed by a payload. All values are little-endian.
+# Header: magic "SN", version (uint8), message type (uint8), count (uint16), payload length (uint32).
+# Games that do not start with the magic bytes use the old text protocol.
+FRAME_MAGIC = b"SN"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<2sBBHI")
+
+# Game -> AI. Payload: count observations of OBSERVATION_SIZE float32 values.
+MESSAGE_OBSERVATIONS = 1
+
+# Game -> AI. Payload: the score as float32.
+MESSAGE_DEAD = 2
+
+# AI -> game. Payload: a status, followed by count moves as uint8 (0 = left, 1 = right, 2 = up, 3 = down).
+MESSAGE_MOVES = 3
+
+# AI -> game. Payload: a status. Sent when the game should start a new snake.
+MESSAGE_UPDATE = 4
+
+# AI -> game. No payload. Sent when the game has to wait for the next generation.
+MESSAGE_BREED = 5
+
+# The status is the generation (uint32), the individual (uint32) and the average score of the previous generation (float32).
+FRAME_STATUS = struct.Struct("<IIf")
+
+OBSERVATION_SIZE = 24
+
+# Frames with a larger payload are refused before it is read, so a bad header can not make the AI buffer gigabytes.
+MAX_PAYLOAD_LENGTH = 1 << 20
+
+
+# Build a frame to send to a game.
+def encode_frame(message_type: int, payload: bytes = b"", count: int = 0) -> bytes:
+    return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, message_type, count, len(payload)) + payload
+
+
+# The payload length a game has to send for a message type, or None for message types a game does not send.
+def expected_payload_length(message_type: int, count: int):
+    if message_type == MESSAGE_OBSERVATIONS:
+        return count * OBSERVATION_SIZE * 4
+    elif message_type == MESSAGE_DEAD:
+        return 4
+
+    return None
 
 
 class CustomGeNN(GeNNetic):
+    checkpoint_attributes = GeNNetic.checkpoint_attributes + ("archive_filename", "champion_count")
+
+    def __init__(self, hidden_layer_count: int, network_structure: list, population_size: int = 50, mutation_chance: float = 0.02, mutation_severity: int = 3, activation_function="tanh", breeding_function="crossover", console_log_level=logging.INFO, file_log_level=logging.INFO, archive_filename="hall_of_fame.archive", champion_count: int = 1, evolution_mode="generational", pipeline_threshold: float = None, lazy_breeding: bool = False, dtype="float64"):
+        super().__init__(hidden_layer_count, network_structure, population_size, mutation_chance, mutation_severity, activation_function, breeding_function, console_log_level, file_log_level, evolution_mode=evolution_mode, pipeline_threshold=pipeline_threshold, lazy_breeding=lazy_breeding, dtype=dtype)
+        # Keep the best champion_count networks and the scores of every generation in one archive, starting over.
+        self.archive_filename = archive_filename
+        self.champion_count = champion_count
+        self.open_hall_of_fame(truncate=True)
+
+    # Continue the archive of a loaded checkpoint.
+    @classmethod
+    def load_network(cls, filename: str = "GeNN.checkpoint", console_log_level=logging.INFO, file_log_level=None):
+        genn = super().load_network(filename, console_log_level, file_log_level)
+        genn.open_hall_of_fame()
 
-    def __init__(self, hidden_layer_count: int, network_structure: list, population_size: int = 50, mutation_chance: float = 0.02, mutation_severity: int = 3, activation_function="tanh", breeding_function="crossover", console_log_level=logging.INFO, file_log_level=logging.INFO, data_filename="data.csv"):
-        super().__init__(hidden_layer_count, network_structure, population_size, mutation_chance, mutation_severity, activation_function, breeding_function, console_log_level, file_log_level)
-        self.data_filename = data_filename
+        return genn
 
-        # Make an empty file and write the CSV header.
-        with open(self.data_filename, 'wt') as fp:
-            fp.write("Generation,Score,BestScore\n")
+    def open_hall_of_fame(self, truncate: bool = False):
+        self.hall_of_fame = archive.HallOfFame(self.archive_filename, self.hidden_layer_count, self.network_structure, self.activation_function, self.champion_count, truncate=truncate)
 
     def fitness(self, inputs: list, outputs: list):
         pass
 
-    def breed(self):
-        # Append data to data.csv.
-        with open(self.data_filename, 'at') as fp:
-            fp.write("{},{},{}\n".format(
-                self.generation,
-                sum(self.specimen_fitness.values()),
-                sorted(self.specimen_fitness.values(), reverse=True)[0]
-            ))
+    # Store the scores and the best networks of every generation, best first. Works in steady-state mode as well.
+    def end_generation(self, scored: np.ndarray, fitness: np.ndarray):
+        super().end_generation(scored, fitness)
+
+        champions = np.argsort(fitness)[::-1][:self.champion_count]
+        self.hall_of_fame.append(self.generation, fitness, self.genomes.genomes[scored[champions]], fitness[champions])
+
+
+class InferenceBatcher:
+    def __init__(self, genn_object: GeNNetic, window: float = 0.001, max_batch_size: int = 64):
+        self.genn_object = genn_object
+
+        # Collect observations for this many seconds, or until this many are waiting.
+        self.window = window
+        self.max_batch_size = max_batch_size
+
+        # The waiting requests as (specimen id, observations, future), and how many observations they hold.
+        self.pending = []
+        self.pending_observations = 0
 
-        # Store the very best to a file.
-        # Create a directory for them if it doesn't exist already.
-        if not os.path.exists("BestNetworks"):
-            os.mkdir("BestNetworks")
+        # The timer that runs the batch when the window closes.
+        self.flush_timer = None
 
-        # Save the best.
-        with open(os.path.join("BestNetworks", f"{self.generation}.pickle"), 'wb') as fp:
-            best_id = sorted(self.specimen_fitness.keys(), key=lambda x: self.specimen_fitness[x])[0]
-            best_network = self.specimen[best_id]
+    # Get the outputs of a specimen for an (N, input_size) array of observations.
+    # The observations are combined with those of other games into one forward pass.
+    async def predict(self, specimen_id: int, observations: np.ndarray) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
 
-            pickle.dump(best_network, fp)
+        self.pending.append((specimen_id, observations, future))
+        self.pending_observations += observations.shape[0]
 
-        # Run the original breeding function.
-        super().breed()
+        if self.pending_observations >= self.max_batch_size:
+            self.flush()
+        elif self.flush_timer is None:
+            self.flush_timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+        return await future
+
+    # Run all waiting observations as one batch and hand every game its own outputs.
+    def flush(self):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+
+        pending = self.pending
+        self.pending = []
+        self.pending_observations = 0
+
+        if not pending:
+            return
+
+        # Every observation is paired with the specimen of the game that sent it.
+        specimen_ids = np.concatenate([np.full(observations.shape[0], specimen_id) for specimen_id, observations, _ in pending])
+        observations = np.concatenate([observations for _, observations, _ in pending])
+
+        try:
+            outputs = self.genn_object.predict_specimens(specimen_ids, observations)
+        except Exception as e:
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Route the outputs back in the order they came in.
+        start = 0
+        for _, request_observations, future in pending:
+            end = start + request_observations.shape[0]
+
+            # The game might have disconnected in the meantime.
+            if not future.done():
+                future.set_result(outputs[start:end])
+
+            start = end
 
 
 class SnekAI:
-    def __init__(self, load_genn_file="", console_log_level=logging.INFO, file_log_level=None):
+    # With pipeline_threshold, the next generation is bred in the background once that fraction of the generation
+    # has been scored, see nnetwork.util.pipeline. It is off by default.
+    def __init__(self, load_genn_file="", console_log_level=logging.INFO, file_log_level=None, batch_window: float = 0.001, max_batch_size: int = 64, pipeline_threshold: float = None):
         # Check if the file exists, and if it does, load it.
         genn_loaded = False
 
         if load_genn_file:
             if os.path.exists(load_genn_file):
-                with open(load_genn_file, "rb") as fp:
-                    self.genn_object = pickle.load(fp)
-                    genn_loaded = True
+                self.genn_object = CustomGeNN.load_network(load_genn_file, console_log_level=console_log_level, file_log_level=file_log_level)
+                genn_loaded = True
 
         # If it failed to load the file, generate a new genn object.
         if not genn_loaded:
-            self.genn_object = CustomGeNN(hidden_layer_count=3, network_structure=[24, 40, 40, 40, 4], population_size=2000, mutation_chance=0.05, activation_function="sigmoid", breeding_function="crossover", console_log_level=console_log_level, file_log_level=file_log_level, data_filename=f"{__file__}.csv")
+            self.genn_object = CustomGeNN(hidden_layer_count=3, network_structure=[24, 40, 40, 40, 4], population_size=2000, mutation_chance=0.05, activation_function="sigmoid", breeding_function="crossover", console_log_level=console_log_level, file_log_level=file_log_level, archive_filename=f"{__file__}.archive", pipeline_threshold=pipeline_threshold)
+
+        # Make a central asyncio server.
+        self.server = None
 
-        # Make a central server socket.
-        self.server_socket = None
+        # Keep track of the connected games. Every game evaluates its own specimen.
+        self.connections = set()
 
-        # Keep a write queue to write to clients.
-        self.write_queue = {}
-        self.last_read_from = {}
+        # Games wait on this when every specimen of the generation is being evaluated.
+        self.generation_bred = None
 
-        # Keep track of the current score of the AI.
-        self.current_score = 0
+        # Wake up a game if nothing has been read from it for this many seconds.
+        self.wake_up_interval = 30
+
+        # Predictions of all games are batched together, see InferenceBatcher.
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.batcher = None
 
         # Make a logger if requested.
         if console_log_level is not None or file_log_level is not None:
@@ -107,106 +222,181 @@ class SnekAI:
 
     # Run the AI over the nnetwork.
     def start_server(self, port=6969):
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-        with self.server_socket:
-            inputs = [self.server_socket]
-            outputs = []
-
-            # Start accepting connections.
-            self.server_socket.setblocking(False)
-            self.server_socket.bind(('', port))
-            self.server_socket.listen(1)
-
-            self.log(logging.INFO, f"Ready for connections on {port}.")
-
-            while inputs:
-                readable, writable, exceptions = select.select(inputs, outputs, inputs)
-
-                for s in readable:
-                    if s is self.server_socket:
-                        # Accept a new client if available.
-                        c_sock, _ = self.server_socket.accept()
-
-                        self.log(logging.INFO, f"Snek Game connected. Starting with Gen {self.genn_object.generation} and Ind {self.genn_object.current_specimen}")
-
-                        c_sock.setblocking(False)
-
-                        inputs.append(c_sock)
-                    else:
-                        # Read the data sent to us.
-                        data = s.recv(1024)
-
-                        # The data has to be something, otherwise the client isn't connected.
-                        if data:
-                            # Add s to the write queue after receiving.
-                            if s not in self.write_queue.keys():
-                                self.write_queue[s] = queue.Queue()
-
-                            # Check if the AI died.
-                            if "DEAD" in data.decode("utf-8"):
-                                score = data.decode("utf-8").split(";")[1]
-                                self.handle_death(s, score)
-                            else:
-                                # Let the AI make a move.
-                                response = self.parse_game_data(data)
-                                self.write_queue[s].put(response)
-
-                            self.last_read_from[s] = time.time()
-
-                            if s not in outputs:
-                                outputs.append(s)
-                        else:
-                            # The client is disconnected. Remove from lists and break the connection.
-                            if s in outputs:
-                                outputs.remove(s)
-
-                            inputs.remove(s)
-                            s.close()
-
-                            if s in self.write_queue.keys():
-                                del self.write_queue[s]
-
-                            self.log(logging.INFO, "Lost connection to Snek.")
-
-                for s in writable:
-                    # Write back to the client if a message awaits them.
-                    if s in self.write_queue.keys():
-                        try:
-                            # Get the message waiting to be sent from the queue.
-                            next_message = self.write_queue[s].get_nowait()
-                        except queue.Empty:
-                            outputs.remove(s)
-                        else:
-                            # Send the message.
-                            s.send(next_message.encode("utf-8"))
-
-                for s in exceptions:
-                    # Something went wrong with the client. Break off connection.
-                    if s in outputs:
-                        outputs.remove(s)
-
-                    inputs.remove(s)
-                    s.close()
-                    del self.write_queue[s]
-
-                    self.log(logging.INFO, "Lost connection to Snek.")
-
-                for s in self.last_read_from.keys():
-                    # Check the time we last sent a message to Snek.
-                    if time.time() - self.last_read_from[s] >= 30:
-                        # Wake up Snek if it is stuck in a Receive() loop.
-                        if s not in self.write_queue.keys():
-                            self.write_queue[s] = queue.Queue()
-
-                        self.write_queue[s].put("{};{};{};{}".format(
-                            "U",
-                            self.genn_object.generation,
-                            self.genn_object.current_specimen,
-                            "0"
-                        ))
-
-    def parse_game_data(self, data):
+        asyncio.run(self.serve(port))
+
+    async def serve(self, port=6969):
+        self.generation_bred = asyncio.Condition()
+        self.batcher = InferenceBatcher(self.genn_object, self.batch_window, self.max_batch_size)
+        self.server = await asyncio.start_server(self.handle_connection, port=port)
+
+        self.log(logging.INFO, f"Ready for connections on {port}.")
+
+        async with self.server:
+            await self.server.serve_forever()
+
+    # Run a single game. Each game gets its own specimen, so several games evaluate in parallel.
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = SnekConnection(writer)
+        self.connections.add(connection)
+
+        self.log(logging.INFO, f"Snek Game connected. Starting with Gen {self.genn_object.generation}. {len(self.connections)} games connected.")
+
+        try:
+            # Schedule a wake-up in case the game gets stuck waiting for us.
+            self.schedule_wake_up(connection)
+
+            # The first bytes tell which protocol the game speaks.
+            magic = await reader.readexactly(len(FRAME_MAGIC))
+
+            if magic == FRAME_MAGIC:
+                connection.binary = True
+                await self.handle_binary_connection(connection, reader)
+            else:
+                await self.handle_text_connection(connection, reader, magic)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            # The client is disconnected. Give its specimen to the next game and break the connection.
+            connection.cancel_wake_up()
+            self.connections.discard(connection)
+
+            if connection.specimen_id is not None:
+                self.genn_object.release_specimen(connection.specimen_id)
+                connection.specimen_id = None
+
+                # Games that are waiting for a specimen can take the one that was given back.
+                async with self.generation_bred:
+                    self.generation_bred.notify_all()
+
+            writer.close()
+
+            self.log(logging.INFO, "Lost connection to Snek.")
+
+    # Talk to a game using the old text protocol.
+    async def handle_text_connection(self, connection, reader: asyncio.StreamReader, data: bytes):
+        # The first bytes have been read already.
+        data += await reader.read(1024)
+
+        while True:
+            # The data has to be something, otherwise the client isn't connected.
+            if not data:
+                break
+
+            # Check if the AI died.
+            if "DEAD" in data.decode("utf-8"):
+                score = data.decode("utf-8").split(";")[1]
+                response = await self.handle_death(connection, score)
+            else:
+                # Let the AI make a move.
+                specimen_id = await self.acquire_specimen(connection)
+                response = await self.parse_game_data(data, specimen_id)
+
+            connection.writer.write(response.encode("utf-8"))
+            await connection.writer.drain()
+
+            # Schedule a wake-up in case the game gets stuck waiting for us.
+            self.schedule_wake_up(connection)
+
+            # Read the data sent to us.
+            data = await reader.read(1024)
+
+    # Talk to a game using the binary protocol. The magic bytes of the first frame have been read already.
+    async def handle_binary_connection(self, connection, reader: asyncio.StreamReader):
+        magic = FRAME_MAGIC
+
+        while True:
+            if magic != FRAME_MAGIC:
+                self.log(logging.WARN, f"Received invalid frame magic: {repr(magic)}")
+                return
+
+            # Read the rest of the header. Partial and coalesced reads are handled by the stream.
+            _, version, message_type, count, payload_length = FRAME_HEADER.unpack(magic + await reader.readexactly(FRAME_HEADER.size - len(FRAME_MAGIC)))
+
+            # Check the header before the payload is read, so a bad frame is never buffered.
+            if version != FRAME_VERSION:
+                self.log(logging.WARN, f"Received frame with unsupported version {version}.")
+                return
+
+            expected_length = expected_payload_length(message_type, count)
+            if expected_length is None:
+                self.log(logging.WARN, f"Received frame with unknown message type {message_type}.")
+                return
+
+            if payload_length != expected_length or payload_length > MAX_PAYLOAD_LENGTH:
+                self.log(logging.WARN, f"Received frame of type {message_type} with a payload of {payload_length} bytes, expected {expected_length}.")
+                return
+
+            # Read exactly one payload.
+            payload = await reader.readexactly(payload_length)
+
+            if message_type == MESSAGE_OBSERVATIONS:
+                # Let the AI make the moves.
+                specimen_id = await self.acquire_specimen(connection)
+                response = await self.parse_observations(memoryview(payload), count, specimen_id)
+            else:
+                # The snake died. The payload is its score.
+                score, = struct.unpack_from("<f", payload)
+
+                if await self.record_death(connection, score):
+                    response = encode_frame(MESSAGE_BREED)
+                else:
+                    response = encode_frame(MESSAGE_UPDATE, self.encode_status(connection.specimen_id))
+
+            connection.writer.write(response)
+            await connection.writer.drain()
+
+            # Schedule a wake-up in case the game gets stuck waiting for us.
+            self.schedule_wake_up(connection)
+
+            magic = await reader.readexactly(len(FRAME_MAGIC))
+
+    # Pack the generation, individual and average score for the binary protocol.
+    def encode_status(self, specimen_id: int) -> bytes:
+        return FRAME_STATUS.pack(self.genn_object.generation, specimen_id, self.genn_object.previous_generation_score / self.genn_object.population_size)
+
+    # Make the moves for a frame of observations without copying them. The payload length has been checked already.
+    async def parse_observations(self, payload: memoryview, count: int, specimen_id: int) -> bytes:
+        observations = np.frombuffer(payload, dtype="<f4").reshape(count, OBSERVATION_SIZE)
+        guesses = await self.batcher.predict(specimen_id, observations)
+
+        # Return the moves the game makes.  (0 = left, 1 = right, 2 = up, 3 = down)
+        moves = np.argmax(guesses, axis=1).astype(np.uint8)
+
+        return encode_frame(MESSAGE_MOVES, self.encode_status(specimen_id) + moves.tobytes(), count)
+
+    # Get the specimen a game is evaluating, or hand it a new one.
+    # If every specimen is being evaluated, wait until the next generation has been bred.
+    async def acquire_specimen(self, connection) -> int:
+        while connection.specimen_id is None:
+            connection.specimen_id = self.genn_object.acquire_specimen()
+
+            if connection.specimen_id is None:
+                async with self.generation_bred:
+                    await self.generation_bred.wait()
+
+        return connection.specimen_id
+
+    # Wake up Snek if it is stuck in a Receive() loop.
+    def schedule_wake_up(self, connection):
+        connection.cancel_wake_up()
+        connection.wake_up_timer = asyncio.get_running_loop().call_later(self.wake_up_interval, self.wake_up, connection)
+
+    def wake_up(self, connection):
+        specimen_id = connection.specimen_id if connection.specimen_id is not None else self.genn_object.current_specimen
+
+        if connection.binary:
+            connection.writer.write(encode_frame(MESSAGE_UPDATE, FRAME_STATUS.pack(self.genn_object.generation, specimen_id, 0)))
+        else:
+            connection.writer.write("{};{};{};{}".format("U", self.genn_object.generation, specimen_id, "0").encode("utf-8"))
+
+        # Keep waking it up until it responds.
+        self.schedule_wake_up(connection)
+
+    async def parse_game_data(self, data, specimen_id: int = None):
+        # Without a specimen, use the one being trained serially.
+        if specimen_id is None:
+            specimen_id = self.genn_object.current_specimen
+
         # Data is separated by a semicolon.
         data = data.decode("utf-8").split(';')
 
@@ -221,13 +411,13 @@ class SnekAI:
             data = [float(x) for x in data]
 
             # Separate the data passed into the AI, and the ones used for the fitness function.
-            guess = self.genn_object.specimen[self.genn_object.current_specimen].make_prediction(data[:24])  # data is the surroundings of the snake, together with the distance differentials.
+            guess = (await self.batcher.predict(specimen_id, np.array([data[:24]])))[0].tolist()  # data is the surroundings of the snake, together with the distance differentials.
 
             # Return the move the game makes.  (0 = left, 1 = right, 2 = up, 3 = down)
             move = "LRUD"[guess.index(max(guess))]
 
             # Send the move, plus the generation and individual number back.
-            return_data = ";".join(map(str, [move, self.genn_object.generation, self.genn_object.current_specimen, self.genn_object.previous_generation_score / self.genn_object.population_size]))
+            return_data = ";".join(map(str, [move, self.genn_object.generation, specimen_id, self.genn_object.previous_generation_score / self.genn_object.population_size]))
             self.log(logging.DEBUG, f"Received this data: {repr(data)}")
             self.log(logging.DEBUG, f"Sending this data back: {return_data}")
         else:
@@ -236,27 +426,53 @@ class SnekAI:
         return return_data
 
     # A function to handle a client disconnect, meaning the AI died.
-    def handle_death(self, s, score):
-        # Update the fitness of the nnetwork.
-        fitness = float(score)
+    async def handle_death(self, connection, score) -> str:
+        if await self.record_death(connection, float(score)):
+            # Notify Unity we're breeding.
+            return "BREED"
+
+        return ";".join(map(str, ["U", self.genn_object.generation, connection.specimen_id, self.genn_object.previous_generation_score / self.genn_object.population_size]))  # Otherwise Unity dies.
 
-        # Store that in the global fitness dictionary.
-        self.genn_object.specimen_fitness[self.genn_object.current_specimen] = fitness
+    # Store the fitness of the specimen of a game and hand the game the next one.
+    # Returns True if the game has to wait for the next generation.
+    async def record_death(self, connection, fitness: float) -> bool:
+        specimen_id = await self.acquire_specimen(connection)
 
         # Notify that the AI died.
-        self.log(logging.INFO, f"AI {self.genn_object.generation}:{self.genn_object.current_specimen} died. Score: {self.current_score}.")
+        self.log(logging.INFO, f"AI {self.genn_object.generation}:{specimen_id} died. Score: {fitness}.")
+
+        # Store that in the global fitness dictionary. This breeds if it was the last of the generation.
+        connection.specimen_id = None
+        generation_bred = self.genn_object.report_fitness(specimen_id, fitness)
+
+        if generation_bred:
+            # Let the games that are waiting for a specimen have a go.
+            async with self.generation_bred:
+                self.generation_bred.notify_all()
+
+        # Let the next AI have a go, if there is one left in this generation.
+        connection.specimen_id = self.genn_object.acquire_specimen()
+
+        return generation_bred or connection.specimen_id is None
 
-        # Check if we're about to breed.
-        if self.genn_object.current_specimen >= self.genn_object.population_size - 1:
-            # Notify Unity we're breeding.
-            self.write_queue[s].put("BREED")
-        else:
-            self.write_queue[s].put(
-                ";".join(map(str, ["U", self.genn_object.generation, self.genn_object.current_specimen, self.genn_object.previous_generation_score / self.genn_object.population_size]))
-            )  # Otherwise Unity dies.
 
-        # Let the next AI have a go.
-        self.genn_object.next_specimen()
+class SnekConnection:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+        # The specimen this game is evaluating.
+        self.specimen_id = None
+
+        # The timer that wakes up the game.
+        self.wake_up_timer = None
+
+        # Whether the game speaks the binary protocol.
+        self.binary = False
+
+    def cancel_wake_up(self):
+        if self.wake_up_timer is not None:
+            self.wake_up_timer.cancel()
+            self.wake_up_timer = None
 
 
 def main(s: SnekAI):
@@ -279,8 +495,8 @@ def main(s: SnekAI):
 
 if __name__ == "__main__":
     # Make a SnakeAI object and try to resume where it left off training.
-    s = SnekAI()
-    filename = "{}.pickle".format(__file__.split(".")[0])
+    filename = "{}.checkpoint".format(__file__.split(".")[0])
+    s = SnekAI(load_genn_file=filename)
 
     try:
         # Run the main function.
@@ -293,7 +509,6 @@ if __name__ == "__main__":
         s.genn_object.save_network(filename)
 
         s.log(logging.ERROR, traceback.format_exc())
-        s.server_socket.close()
         s.log(logging.ERROR, "Exiting...")
         exit(1)
 
@@ -303,8 +518,5 @@ if __name__ == "__main__":
         s.log(logging.INFO, f"Saving GeNN to {filename}...")
         s.genn_object.save_network(filename)
 
-        s.log(logging.INFO, "Closing server socket...")
-        s.server_socket.close()
-
         s.log(logging.INFO, "Exiting...")
         exit(0)
@@ -0,0 +1,175 @@
+import logging
+
+import numpy as np
+
+from nnetwork.classes.environment import VectorEnvironment
+from nnetwork.util import rng
+
+
+# The directions the snake looks in, as (row, column) steps: up, up-right, right, down-right, down, down-left, left, up-left.
+LOOK_DIRECTIONS = np.array([
+    [-1, 0],
+    [-1, 1],
+    [0, 1],
+    [1, 1],
+    [1, 0],
+    [1, -1],
+    [0, -1],
+    [-1, -1],
+])
+
+# The moves, in the same order as the outputs of the network: left, right, up, down.
+MOVES = np.array([
+    [0, -1],
+    [0, 1],
+    [-1, 0],
+    [1, 0],
+])
+
+
+class SnakeEnvironment(VectorEnvironment):
+    def __init__(self, batch_size: int, width: int = 20, height: int = 20, max_steps_without_food: int = 100, random_generator: rng.RNG = None):
+        # Keep batch_size games that all step together.
+        super().__init__(batch_size)
+        self.width = width
+        self.height = height
+
+        # A snake that does not find food in time starves, so circling snakes end.
+        self.max_steps_without_food = max_steps_without_food
+
+        if random_generator is None:
+            random_generator = rng.DEFAULT_RNG
+        self.rng = random_generator
+
+        # Every cell of the body holds the amount of steps until the tail leaves it. Empty cells are 0.
+        self.body = np.zeros((batch_size, height, width), dtype=np.int32)
+        self.heads = np.zeros((batch_size, 2), dtype=np.intp)
+        self.food = np.zeros((batch_size, 2), dtype=np.intp)
+        self.lengths = np.zeros(batch_size, dtype=np.int32)
+        self.steps_without_food = np.zeros(batch_size, dtype=np.int32)
+
+        # The score is the amount of food eaten, like the score the game sends when the snake dies.
+        self.scores = np.zeros(batch_size, dtype=np.float64)
+        self.dead = np.zeros(batch_size, dtype=bool)
+
+    # Start new games and return the first observations, with shape (batch_size, 24).
+    def reset(self) -> np.ndarray:
+        self.body[:] = 0
+        self.scores[:] = 0
+        self.dead[:] = False
+        self.steps_without_food[:] = 0
+
+        # Every snake starts in the middle with a length of 1.
+        self.heads[:] = [self.height // 2, self.width // 2]
+        self.lengths[:] = 1
+        self.body[np.arange(self.batch_size), self.heads[:, 0], self.heads[:, 1]] = 1
+
+        self.place_food(np.arange(self.batch_size))
+
+        return self.observe()
+
+    # Put food on a random empty cell in the given games.
+    def place_food(self, games: np.ndarray):
+        if games.shape[0] == 0:
+            return
+
+        # Give every empty cell a random number and take the highest.
+        cell_scores = self.rng.random_array((games.shape[0], self.height, self.width))
+        cell_scores[self.body[games] > 0] = -1
+
+        cells = np.argmax(cell_scores.reshape(games.shape[0], -1), axis=1)
+        self.food[games, 0] = cells // self.width
+        self.food[games, 1] = cells % self.width
+
+    # Move every snake that is still alive. Actions are 0 = left, 1 = right, 2 = up, 3 = down.
+    # Returns the observations, the reward of this step and whether each game is over.
+    def step(self, actions) -> tuple:
+        actions = np.asarray(actions, dtype=np.intp)
+        alive = np.flatnonzero(~self.dead)
+
+        new_heads = self.heads[alive] + MOVES[actions[alive]]
+
+        # Hitting a wall kills the snake.
+        inside = (new_heads[:, 0] >= 0) & (new_heads[:, 0] < self.height) & (new_heads[:, 1] >= 0) & (new_heads[:, 1] < self.width)
+        clipped_heads = np.clip(new_heads, 0, [self.height - 1, self.width - 1])
+
+        ate = inside & np.all(new_heads == self.food[alive], axis=1)
+
+        # The tail moves along, unless the snake grows.
+        moving = alive[~ate]
+        self.body[moving] -= self.body[moving] > 0
+
+        # Running into its own body kills the snake as well.
+        collided = self.body[alive, clipped_heads[:, 0], clipped_heads[:, 1]] > 0
+
+        self.steps_without_food[alive] = np.where(ate, 0, self.steps_without_food[alive] + 1)
+        starved = self.steps_without_food[alive] >= self.max_steps_without_food
+
+        died = ~inside | collided | starved
+        self.dead[alive[died]] = True
+
+        # Move the heads of the survivors.
+        survivors = ~died
+        survivor_games = alive[survivors]
+        self.lengths[survivor_games] += ate[survivors]
+        self.heads[survivor_games] = new_heads[survivors]
+        self.body[survivor_games, new_heads[survivors, 0], new_heads[survivors, 1]] = self.lengths[survivor_games]
+
+        rewards = np.zeros(self.batch_size, dtype=np.float64)
+        rewards[survivor_games] = ate[survivors]
+        self.scores += rewards
+
+        self.place_food(survivor_games[ate[survivors]])
+
+        return self.observe(), rewards, self.dead.copy()
+
+    # Look in 8 directions from the head. For every direction there are 3 values:
+    # 1 / the distance to the wall, 1 if there is food in that direction, and 1 / the distance to the body (0 if there is none).
+    def observe(self) -> np.ndarray:
+        reach = max(self.width, self.height)
+        distances = np.arange(1, reach + 1)
+
+        # The cells on every ray, with shape (batch_size, 8, reach, 2).
+        rays = self.heads[:, np.newaxis, np.newaxis, :] + LOOK_DIRECTIONS[np.newaxis, :, np.newaxis, :] * distances[np.newaxis, np.newaxis, :, np.newaxis]
+        inside = (rays[..., 0] >= 0) & (rays[..., 0] < self.height) & (rays[..., 1] >= 0) & (rays[..., 1] < self.width)
+
+        rows = np.clip(rays[..., 0], 0, self.height - 1)
+        columns = np.clip(rays[..., 1], 0, self.width - 1)
+        games = np.arange(self.batch_size)[:, np.newaxis, np.newaxis]
+
+        # The wall is right after the last cell that is inside.
+        wall_distances = inside.sum(axis=2) + 1
+
+        food_seen = inside & (rows == self.food[:, 0, np.newaxis, np.newaxis]) & (columns == self.food[:, 1, np.newaxis, np.newaxis])
+
+        body_seen = inside & (self.body[games, rows, columns] > 0)
+        body_distances = np.where(body_seen.any(axis=2), np.argmax(body_seen, axis=2) + 1, np.inf)
+
+        observations = np.stack([1 / wall_distances, food_seen.any(axis=2), 1 / body_distances], axis=2).reshape(self.batch_size, 24)
+
+        # Dead games see nothing.
+        observations[self.dead] = 0
+
+        return observations
+
+
+# Train without the Unity client: score every generation in the headless environment and breed.
+def train_headless(genn_object, generations: int, max_steps: int = 1000, **environment_settings):
+    environment = SnakeEnvironment(genn_object.population_size, random_generator=genn_object.rng, **environment_settings)
+
+    for _ in range(generations):
+        genn_object.evaluate_episodes(environment, max_steps)
+
+
+if __name__ == "__main__":
+    from snek import CustomGeNN
+
+    genn = CustomGeNN(hidden_layer_count=3, network_structure=[24, 40, 40, 40, 4], population_size=2000, mutation_chance=0.05, activation_function="sigmoid", breeding_function="crossover", console_log_level=logging.INFO, file_log_level=None, archive_filename=f"{__file__}.archive", dtype="float32")
+
+    try:
+        train_headless(genn, generations=1000)
+    except KeyboardInterrupt:
+        genn.log("Interrupt received.")
+
+    genn.log("Saving GeNN to snek_env.checkpoint...")
+    genn.save_network("snek_env.checkpoint")